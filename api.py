@@ -0,0 +1,251 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import json
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, abort, current_app, request, stream_with_context
+from models import db, Venue, Artist, Show
+import conditional
+import queries
+import search
+import showqueue
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+#----------------------------------------------------------------------------#
+# JSON API.
+#----------------------------------------------------------------------------#
+
+# /api/v1 mirrors the HTML controllers for machine clients. It runs the same
+# query functions as app.py but skips Jinja entirely. Lists and details use
+# the updated_at validators of conditional.py and search responses an ETag of
+# the body, so If-None-Match is answered with a 304. List responses are
+# streamed row by row as a JSON array, or as NDJSON with ?format=ndjson or
+# Accept: application/x-ndjson. /shows/calendar counts the shows per day,
+# week or month, with the same from/to/city/venue_id/artist_id/genre filters
+# as /shows. /venues/autocomplete and /artists/autocomplete return the names
+# starting with ?q= for the pickers of the new show form.
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def _default(value):
+  if isinstance(value, datetime):
+    return value.isoformat()
+  raise TypeError('%r is not JSON serializable' % (value,))
+
+
+def dumps(value):
+  """Serialize to UTF-8 JSON bytes, with orjson when it is installed."""
+  if orjson is not None:
+    return orjson.dumps(value, default=_default)
+  return json.dumps(value, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def _wants_ndjson():
+  if request.args.get('format') == 'ndjson':
+    return True
+  best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+  return best == 'application/x-ndjson'
+
+
+def _stream(query):
+  """Stream the rows of a column query without loading them all in memory."""
+  rows = (row._asdict() for row in query.yield_per(current_app.config['STREAM_BATCH_SIZE']))
+
+  if _wants_ndjson():
+    def generate():
+      for row in rows:
+        yield dumps(row) + b'\n'
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+  def generate():
+    yield b'['
+    separator = b''
+    for row in rows:
+      yield separator + dumps(row)
+      separator = b','
+    yield b']'
+  return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def _error(error):
+  return Response(dumps({"error": error.code, "message": error.description}),
+                  status=error.code, mimetype='application/json')
+
+
+def _search_response(data):
+  response = Response(dumps(data), mimetype='application/json')
+  response.add_etag()
+  return response.make_conditional(request)
+
+
+def _autocomplete_response(data):
+  # names change rarely, let the browser keep the answer of each prefix a while
+  response = _search_response(data)
+  response.cache_control.public = True
+  response.cache_control.max_age = current_app.config['AUTOCOMPLETE_CACHE_TIMEOUT']
+  return response
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@api.route('/venues')
+def venues():
+  etag = conditional.list_validator(Venue)
+  response = conditional.not_modified(etag)
+  if response:
+    return response
+  response = _stream(queries.venue_directory_query(request.args.get('state'), request.args.get('genre')))
+  return conditional.apply(response, etag)
+
+
+@api.route('/venues/search')
+def search_venues():
+  return _search_response(search.search_venues(request.args.get('q', '')))
+
+
+@api.route('/venues/autocomplete')
+def autocomplete_venues():
+  return _autocomplete_response(search.autocomplete_venues(request.args.get('q', '')))
+
+
+@api.route('/venues/<int:venue_id>')
+def show_venue(venue_id):
+  etag = conditional.venue_validator(venue_id)
+  if etag is None:
+    abort(404)
+  response = conditional.not_modified(etag)
+  if response:
+    return response
+  data, next_show_time = queries.venue_detail(venue_id)
+  if not data:
+    abort(404)
+  return conditional.apply(Response(dumps(data), mimetype='application/json'), etag)
+
+AVAILABILITY_DAYS = 7
+AVAILABILITY_MAX_DAYS = 92
+
+
+@api.route('/venues/<int:venue_id>/availability')
+def venue_availability(venue_id):
+  # free slots of a venue between ?from= and ?to= (default: the next week),
+  # at least ?duration= minutes long
+  filters = _show_filters()
+  start = filters.get('start') or datetime.now().replace(minute=0, second=0, microsecond=0)
+  end = filters.get('end') or start + timedelta(days=AVAILABILITY_DAYS)
+  if not start < end <= start + timedelta(days=AVAILABILITY_MAX_DAYS):
+    abort(400, 'to must be after from, at most %d days later' % AVAILABILITY_MAX_DAYS)
+  duration = request.args.get('duration', type=int)
+  if db.session.get(Venue, venue_id) is None:
+    abort(404)
+
+  # the default window moves with the clock, so the resolved one is part of
+  # the ETag
+  etag = conditional.list_validator(Show, params=(venue_id, start, end, duration))
+  response = conditional.not_modified(etag)
+  if response:
+    return response
+  slots = queries.venue_availability(venue_id, start, end,
+                                     timedelta(minutes=duration) if duration else None)
+  data = {
+    "venue_id": venue_id,
+    "from": start,
+    "to": end,
+    "slots": [{"start": slot_start, "end": slot_end} for slot_start, slot_end in slots],
+  }
+  return conditional.apply(Response(dumps(data), mimetype='application/json'), etag)
+
+#  Artists
+#  ----------------------------------------------------------------
+
+@api.route('/artists')
+def artists():
+  etag = conditional.list_validator(Artist)
+  response = conditional.not_modified(etag)
+  if response:
+    return response
+  return conditional.apply(_stream(queries.artist_list_query(request.args.get('genre'))), etag)
+
+
+@api.route('/artists/search')
+def search_artists():
+  return _search_response(search.search_artists(request.args.get('q', '')))
+
+
+@api.route('/artists/autocomplete')
+def autocomplete_artists():
+  return _autocomplete_response(search.autocomplete_artists(request.args.get('q', '')))
+
+
+@api.route('/artists/<int:artist_id>')
+def show_artist(artist_id):
+  etag = conditional.artist_validator(artist_id)
+  if etag is None:
+    abort(404)
+  response = conditional.not_modified(etag)
+  if response:
+    return response
+  data, next_show_time = queries.artist_detail(artist_id)
+  if not data:
+    abort(404)
+  return conditional.apply(Response(dumps(data), mimetype='application/json'), etag)
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@api.route('/shows')
+def shows():
+  etag = conditional.list_validator(Show, Venue, Artist)
+  response = conditional.not_modified(etag)
+  if response:
+    return response
+
+  after_time = None
+  after = request.args.get('after')
+  after_id = request.args.get('after_id', type=int)
+  if after and after_id is not None:
+    try:
+      after_time = datetime.fromisoformat(after)
+    except ValueError:
+      abort(400)
+  query = queries.shows_query(after_time, after_id, **_show_filters())
+  return conditional.apply(_stream(query), etag)
+
+
+@api.route('/shows/calendar')
+def show_calendar():
+  unit = request.args.get('unit', 'day')
+  if unit not in queries.CALENDAR_UNITS:
+    abort(400, 'unit must be one of %s' % ', '.join(queries.CALENDAR_UNITS))
+  etag = conditional.list_validator(Show, Venue, Artist)
+  response = conditional.not_modified(etag)
+  if response:
+    return response
+  rows = queries.show_calendar_query(unit, **_show_filters())
+  data = [{"period": row.period, "shows": row.shows} for row in rows]
+  return conditional.apply(Response(dumps(data), mimetype='application/json'), etag)
+
+
+@api.route('/shows/submissions/<int:submission_id>')
+def show_submission(submission_id):
+  # status of a queued show creation: pending, created, conflict or invalid
+  data = showqueue.submission_status(submission_id)
+  if data is None:
+    abort(404)
+  response = Response(dumps(data), mimetype='application/json')
+  response.cache_control.no_store = True
+  return response
+
+
+def _show_filters():
+  try:
+    return queries.show_filters(request.args)
+  except ValueError:
+    abort(400, 'from and to must be ISO dates, venue_id and artist_id integers')
@@ -2,115 +2,164 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import os
+from flask import Blueprint, Flask, current_app, get_flashed_messages, make_response, render_template, request, Response, flash, redirect, stream_template, stream_with_context, url_for, jsonify
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 import logging
 from logging import Formatter, FileHandler
-from flask_wtf import Form
 from forms import *
+from models import db, Venue, Artist, Show, DEFAULT_SHOW_DURATION, booking_conflict, refresh_show_counts, set_genres
+import assets
+import benchmark
+import bulk
+import cache
+import conditional
+import dbpool
+import instrumentation
+import queries
+import routing
+from api import api
+import search
+import showqueue
 from flask_migrate import Migrate
-from datetime import datetime
+from datetime import date, datetime, timedelta
+import click
+from functools import lru_cache
+from itertools import groupby
 import sys
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
+# The HTML controllers are the `main` blueprint; create_app() builds an app
+# around it and the /api/v1 blueprint. wsgi.py calls it once for the server
+# (see gunicorn.conf.py), the tests and `flask` CLI call it themselves.
 
-# TODO: connect to a local postgresql database
-migrate = Migrate(app,db)
-
-#----------------------------------------------------------------------------#
-# Models.
-#----------------------------------------------------------------------------#
-
-class Venue(db.Model):
-    __tablename__ = 'Venue'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    genres = db.Column(db.ARRAY(db.String))
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    address = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    website = db.Column(db.String(500))
-    seeking_talent = db.Column(db.Boolean)
-    seeking_description = db.Column(db.String)
-    Shows = db.relationship('Show',backref='Venue',lazy=True)
-
-    # TODO: implement any missing fields, as a database migration using Flask-Migrate
-
-class Artist(db.Model):
-    __tablename__ = 'Artist'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String())
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    website = db.Column(db.String())
-    seeking_venue = db.Column(db.Boolean)
-    seeking_description = db.Column(db.String())
-    shows = db.relationship('Show', backref='Artist',lazy=True)
-
-class Show(db.Model):
-   __tablename__='Show'
-   
-   id = db.Column(db.Integer,primary_key=True)
-   venue_id = db.Column(db.Integer,db.ForeignKey(Venue.id),nullable=False)#tablename.id
-   artist_id = db.Column(db.Integer,db.ForeignKey(Artist.id),nullable=False)#tablename.id
-   start_time= db.Column(db.DateTime)
-
-    # TODO: implement any missing fields, as a database migration using Flask-Migrate
-
-# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+main = Blueprint('main', __name__, cli_group=None)
+moment = Moment()
+migrate = Migrate()
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format,locale='en')
-
-app.jinja_env.filters['datetime'] = format_datetime
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+BABEL_FORMATS = ('full', 'long', 'medium', 'short')
+
+@lru_cache(maxsize=None)
+def _datetime_pattern(format, locale):
+  # parsing a Babel pattern and loading locale data is the costly part, do it
+  # once; babel itself is imported on first use, not at worker start
+  import babel
+  import babel.dates
+  if format not in DATETIME_FORMATS and format in BABEL_FORMATS:
+    # Babel's named formats join a date and a time pattern of the locale
+    return None, babel.Locale.parse(locale)
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), babel.Locale.parse(locale)
+
+@lru_cache(maxsize=4096)
+def _format_datetime(value, format, locale):
+  # list pages repeat the same start times many times over
+  pattern, locale = _datetime_pattern(format, locale)
+  if pattern is None:
+    import babel.dates
+    return babel.dates.format_datetime(value, format, locale=locale)
+  return pattern.apply(value, locale)
+
+def _parse_datetime(value):
+  # dateutil is only needed for form input and legacy string values
+  import dateutil.parser
+  return dateutil.parser.parse(value)
+
+@main.app_context_processor
+def _flashed_messages():
+  # pages without a pending message leave the session alone, so they are
+  # sent without Vary: Cookie and shared caches can store them
+  if conditional.pending_flashes():
+    return {}
+  return {'get_flashed_messages': lambda *args, **kwargs: []}
+
+
+@main.app_template_filter('datetime')
+def format_datetime(value, format='medium', locale='en'):
+  if isinstance(value, str):
+    value = _parse_datetime(value)
+  return _format_datetime(value, format, locale)
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
+@main.route('/')
 def index():
-  return render_template('pages/home.html')
+  # this week, Monday to Sunday, as a /shows date range
+  monday = date.today() - timedelta(days=date.today().weekday())
+  this_week = url_for('.shows', **{'from': monday.isoformat(), 'to': (monday + timedelta(days=6)).isoformat()})
+  return render_template('pages/home.html', this_week=this_week)
+
+
+#  List pages
+#  ----------------------------------------------------------------
+#  /venues, /artists and /shows are rendered with stream_template: the layout
+#  is sent before the rows are read, and the rows are fetched STREAM_BATCH_SIZE
+#  at a time (server-side cursors on Postgres) as the template reaches them,
+#  so neither the time to first byte nor the memory of a worker grows with
+#  the listing. Views pass row generators rather than lists to the templates.
+
+def _stream_page(template, etag, **context):
+  # flashed messages are popped from the session now: it has been saved by
+  # the time the layout asks for them while streaming
+  if conditional.pending_flashes():
+    get_flashed_messages()
+  response = Response(stream_with_context(stream_template(template, **context)))
+  return conditional.apply(response, etag)
+
+
+class KeysetPage(object):
+  """The rows of a keyset page, read as the template iterates them.
+
+  The query asks for one row more than ``page_size``; once the rows have been
+  iterated, ``next_url`` is ``next_url(last_row)`` if that row was there.
+  """
+
+  def __init__(self, query, page_size, next_url):
+    self._query = query.limit(page_size + 1)
+    self.page_size = page_size
+    self._next_url = next_url
+    self.next_url = None
+
+  def __iter__(self):
+    last = None
+    for index, row in enumerate(self._query.yield_per(current_app.config['STREAM_BATCH_SIZE'])):
+      if index < self.page_size:
+        last = row
+        yield row
+      else:
+        self.next_url = self._next_url(last)
+
+
+def _page_size(default_key, max_key):
+  # ?page_size=, bounded by the configured maximum
+  page_size = min(request.args.get('page_size', current_app.config[default_key], type=int),
+                  current_app.config[max_key])
+  if page_size < 1:
+    page_size = current_app.config[default_key]
+  return page_size
 
 
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@main.route('/venues/create', methods=['GET'])
 def create_venue_form():
     form = VenueForm()
     return render_template('forms/new_venue.html', form=form)
   
-    @app.route('/venues/create', methods=['GET', 'POST'])
+    @main.route('/venues/create', methods=['GET', 'POST'])
     def create_venue_submission():
      form = VenueForm()
     error = False
@@ -120,9 +169,7 @@ def create_venue_form():
             venue = Venue()
 
             form.populate_obj(venue)
-            # genres is a list, so convert it to string
-            genresList = request.form.getlist('genres')
-            venue.genres = ', '.join(genresList)
+            set_genres(venue, request.form.getlist('genres'))
             db.session.add(venue)
             # to return users to the new venue's page, flush the session, and store the id in another variable
             db.session.flush()
@@ -143,10 +190,10 @@ def create_venue_form():
             else:
                 flash(
                     'Venue ' + str(form.name.data) + ' was listed successfully!')
-                return redirect(url_for('show_venue', venue_id=venue_id))
+                return redirect(url_for('.show_venue', venue_id=venue_id))
     return render_template('forms/new_venue.html', form=form)
   
-@app.route('/venues/create', methods=['POST'])
+@main.route('/venues/create', methods=['POST'])
 def create_venue_submission():
     error = False
     form=VenueForm()
@@ -159,8 +206,7 @@ def create_venue_submission():
         venue.state = request.form['state']
         venue.address = request.form['address']
         venue.phone = request.form['phone']
-        tmp_genres = request.form.getlist('genres')
-        venue.genres = ','.join(tmp_genres)
+        set_genres(venue, request.form.getlist('genres'))
         venue.facebook_link = request.form['facebook_link']
         db.session.add(venue)
         db.session.commit()
@@ -179,92 +225,66 @@ def create_venue_submission():
     flash("Wrong Vlidations")        
     return render_template('pages/home.html')
 
-@app.route('/venues')
+@main.route('/venues')
 def venues():
-    #venues = Venue.query.order_by(Venue.state, Venue.city).all()
-  areas = Venue.query.distinct('city', 'state').order_by('state').all()
-  for area in areas:
-    area.venues = Venue.query.filter_by(city=area.city, state=area.state)
-    
-  return render_template('pages/venues.html', areas=areas);
+  etag = conditional.list_validator(Venue)
+  response = conditional.not_modified(etag)
+  if response:
+    return response
 
-    
-    #return render_template('pages/venues.html', areas=data)
+  # per-state paging mode: /venues?state=CA renders a single state, reached
+  # through the state links above the directory
+  state = request.args.get('state')
+  states = [row.state for row in
+            db.session.query(Venue.state).filter(Venue.state.isnot(None)).distinct().order_by(Venue.state)]
 
+  # one ordered query for the whole directory, grouped into areas as it is read;
+  # upcoming show counts are the precomputed counters on Venue
+  rows = queries.venue_directory_query(state, request.args.get('genre')).yield_per(current_app.config['STREAM_BATCH_SIZE'])
+  return _stream_page('pages/venues.html', etag,
+                      areas=_venue_areas(rows), states=states, current_state=state)
 
-@app.route('/venues/search', methods=['POST'])
+
+def _venue_areas(rows):
+  for (area_state, area_city), area_venues in groupby(rows, key=lambda row: (row.state, row.city)):
+    yield {"city": area_city, "state": area_state, "venues": area_venues}
+
+
+@main.route('/venues/search', methods=['POST'])
+@routing.read_only
 def search_venues():
-    
-    data = []
-    response = {}
-    
-    search_term = request.form.get('search_term')
-    venues = Venue.query.filter(Venue.name.ilike(f'%{search_term}%')).all()
-    
-    for venue in venues:
-        a = {}
-        a['id'] = venue.id
-        a['name'] = venue.name
-        data.append(a)
-        
-        response['count'] = len(data)
-        response['data'] = data
-        return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
-
-
-@app.route('/venues/<int:venue_id>')
+  search_term = request.form.get('search_term', '')
+  response = search.search_venues(search_term)
+  return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+
+@main.route('/venues/<int:venue_id>')
 def show_venue(venue_id):
-  venue = Venue.query.get(venue_id)
-  shows = Show.query.filter_by(venue_id=venue_id).all()
-  pastShows = []
-  upcomingShows = []
-
-  for show in shows:
-      date = show.start_time
-
-      if date < datetime.now():
-        pastShows.append({
-            "artist_id": Artist.query.filter_by(id=show.artist_id).first().id,
-            "artist_name": Artist.query.filter_by(id=show.artist_id).first().name,
-            "artist_image_link": Artist.query.filter_by(id=show.artist_id).first().image_link,
-            "start_time": str(show.start_time)
-        })
-      if date > datetime.now():
-        upcomingShows.append({
-            "artist_id": Artist.query.filter_by(id=show.artist_id).first().id,
-            "artist_name": Artist.query.filter_by(id=show.artist_id).first().name,
-            "artist_image_link": Artist.query.filter_by(id=show.artist_id).first().image_link,
-            "start_time": str(show.start_time)
-        })
-
-  data = {
-      "id": venue.id,
-      "name": venue.name,
-      "city": venue.city,
-      "state": venue.state,
-      "phone": venue.phone,
-      "image_link": venue.image_link,
-      "website": venue.website,
-      "genres": venue.genres,
-      "facebook_link": venue.facebook_link,
-      "seeking_description": venue.seeking_description,
-      "past_shows": pastShows,
-      "past_shows_count": len(pastShows),
-      "upcoming_shows": upcomingShows,
-      "upcoming_shows_count": len(upcomingShows)
-  }
+  etag = conditional.venue_validator(venue_id)
+  if etag is None:
+    return render_template('errors/404.html'), 404
+  response = conditional.not_modified(etag)
+  if response:
+    return response
 
-  return render_template('pages/show_venue.html', venue=data)
+  html = cache.get_page(cache.venue_key(venue_id, etag))
+  if html is None:
+    data, next_show_time = queries.venue_detail(venue_id)
+    if not data:
+      return render_template('errors/404.html'), 404
+    html = render_template('pages/show_venue.html', venue=data)
+    cache.set_page(cache.venue_key(venue_id, etag), html, expires_at=next_show_time and next_show_time.timestamp())
+  return conditional.respond(html, etag)
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
     form = VenueForm()
     venue = Venue.query.get(venue_id)
     return render_template('forms/edit_venue.html', form=form, venue=venue)
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
     venue = Venue.query.get(venue_id)
 
@@ -275,8 +295,7 @@ def edit_venue_submission(venue_id):
         venue.state = request.form['state']
         venue.address = request.form['address']
         venue.phone = request.form['phone']
-        tmp_genres = request.form.getlist('genres')
-        venue.genres = ','.join(tmp_genres)  # convert list to string
+        set_genres(venue, request.form.getlist('genres'))
         venue.facebook_link = request.form['facebook_link']
         db.session.add(venue)
         db.session.commit()
@@ -292,103 +311,68 @@ def edit_venue_submission(venue_id):
         else:
             flash('Venue ' + request.form['name'] +
                   ' was successfully updated!')
-    return redirect(url_for('show_venue', venue_id=venue_id))
+    return redirect(url_for('.show_venue', venue_id=venue_id))
 
 
 
 #  ----------------------------------------------------------------
-@app.route('/artists')
+ARTIST_LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+@main.route('/artists')
 def artists():
-  # TODO: replace with real data returned from querying the database
-  return render_template('pages/artists.html', artists=Artist.query.all())
+  etag = conditional.list_validator(Artist)
+  response = conditional.not_modified(etag)
+  if response:
+    return response
+
+  # keyset pagination on (lower(name), id), with A-Z links jumping into the listing
+  page_size = _page_size('ARTISTS_PER_PAGE', 'ARTISTS_MAX_PER_PAGE')
+  genre = request.args.get('genre')
+  letter = request.args.get('letter', '')[:1].upper()
+  if letter not in ARTIST_LETTERS:
+    letter = None
+  after_name = request.args.get('after')
+  after_id = request.args.get('after_id', type=int)
+
+  args = {'genre': genre} if genre else {}
+  page = KeysetPage(
+      queries.artist_page_query(after_name, after_id, letter, genre), page_size,
+      lambda last: url_for('.artists', after=last.sort_name, after_id=last.id, page_size=page_size, **args))
+  letters = [(name, url_for('.artists', letter=name, **args)) for name in ARTIST_LETTERS]
+  return _stream_page('pages/artists.html', etag,
+                      page=page, letters=letters, current_letter=letter)
 
  # return render_template('pages/artists.html', artists=data)
 
-@app.route('/artists/search', methods=['POST'])
+@main.route('/artists/search', methods=['POST'])
+@routing.read_only
 def search_artists():
-  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
-  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
-  # search for "band" should return "The Wild Sax Band".
-  # response={
-  #   "count": 1,
-  #   "data": [{
-  #     "id": 4,
-  #     "name": "Guns N Petals",
-  #     "num_upcoming_shows": 0,
-  #   }]
-  # }
-   data = []
-   response = {}
-
-   search_term = request.form.get('search_term')
-   artists = Artist.query.filter(Artist.name.ilike(f'%{search_term}%')).all()
-
-   for artist in artists:
-      a = {}
-      a['id'] = artist.id
-      a['name'] = artist.name
-      data.append(a)
-
-   response['count'] = len(data)
-   response['data'] = data
-   return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
-
-@app.route('/artists/<int:artist_id>')
+  search_term = request.form.get('search_term', '')
+  response = search.search_artists(search_term)
+  return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+@main.route('/artists/<int:artist_id>')
 def show_artist(artist_id):
-  # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
-  # data = list(filter(lambda d: d['id'] == artist_id, [data1, data2, data3]))[0]
-  artist_query = db.session.query(Artist).get(artist_id)
-
-  if not artist_query: 
-    return render_template('errors/404.html')
-
-  past_shows_query = db.session.query(Show).join(Venue).filter(Show.artist_id==artist_id).filter(Show.start_time>datetime.now()).all()
-  past_shows = []
-
-  for show in past_shows_query:
-    past_shows.append({
-      "venue_id": show.venue_id,
-      "venue_name": show.venue.name,
-      "artist_image_link": show.venue.image_link,
-      "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    })
-
-  upcoming_shows_query = db.session.query(Show).join(Venue).filter(Show.artist_id==artist_id).filter(Show.start_time>datetime.now()).all()
-  upcoming_shows = []
-
-  for show in upcoming_shows_query:
-    upcoming_shows.append({
-      "venue_id": show.venue_id,
-      "venue_name": show.venue.name,
-      "artist_image_link": show.venue.image_link,
-      "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    })
-
-
-  data = {
-    "id": artist_query.id,
-    "name": artist_query.name,
-    "genres": artist_query.genres,
-    "city": artist_query.city,
-    "state": artist_query.state,
-    "phone": artist_query.phone,
-    "website": artist_query.website,
-    "facebook_link": artist_query.facebook_link,
-    "seeking_venue": artist_query.seeking_venue,
-    "seeking_description": artist_query.seeking_description,
-    "image_link": artist_query.image_link,
-    "past_shows": past_shows,
-    "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows),
-  }
-  return render_template('pages/show_artist.html', artist=data)
- 
+  etag = conditional.artist_validator(artist_id)
+  if etag is None:
+    return render_template('errors/404.html'), 404
+  response = conditional.not_modified(etag)
+  if response:
+    return response
+
+  html = cache.get_page(cache.artist_key(artist_id, etag))
+  if html is None:
+    data, next_show_time = queries.artist_detail(artist_id)
+    if not data:
+      return render_template('errors/404.html'), 404
+    html = render_template('pages/show_artist.html', artist=data)
+    cache.set_page(cache.artist_key(artist_id, etag), html, expires_at=next_show_time and next_show_time.timestamp())
+  return conditional.respond(html, etag)
+
 
 #  Update 
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
   form = ArtistForm()
   artist={
@@ -407,23 +391,23 @@ def edit_artist(artist_id):
   # TODO: populate form with fields from artist with ID <artist_id>
   return render_template('forms/edit_artist.html', form=form, artist=artist)
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
   # TODO: take values from the form submitted, and update existing
   # artist record with ID <artist_id> using the new attributes
 
-  return redirect(url_for('show_artist', artist_id=artist_id))
+  return redirect(url_for('.show_artist', artist_id=artist_id))
 
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@main.route('/artists/create', methods=['GET'])
 def create_artist_form():
   form = ArtistForm()
   return render_template('forms/new_artist.html', form=form)
 
-@app.route('/artists/create', methods=['POST'])
+@main.route('/artists/create', methods=['POST'])
 def create_artist_submission():
   error = False
   form=ArtistForm()
@@ -435,8 +419,7 @@ def create_artist_submission():
       artist.city = request.form['city']
       artist.state = request.form['state']
       artist.phone = request.form['phone']
-      tmp_genres = request.form.getlist('genres')
-      artist.genres = ','.join(tmp_genres)
+      set_genres(artist, request.form.getlist('genres'))
       artist.website = request.form['website']
       artist.image_link = request.form['image_link']
       artist.facebook_link = request.form['facebook_link']
@@ -459,51 +442,84 @@ def create_artist_submission():
 
 #  Shows
 #  ----------------------------------------------------------------
-@app.route('/shows')
+SHOW_FILTER_ARGS = ('from', 'to', 'city', 'venue_id', 'artist_id', 'genre')
+
+@main.route('/shows')
 def shows():
-  shows = Show.query.all()
-  data = []
-  for show in shows:
-      show = {
-        "venue_id": show.venue_id,
-        "venue_name": db.session.query(Venue.name).filter_by(id=show.venue_id).first()[0],
-        "artist_id": show.artist_id,
-        "artist_name": db.session.query(Artist.name).filter_by(id=show.artist_id).first()[0],
-        "artist_image_link": db.session.query(Artist.image_link).filter_by(id=show.artist_id).first()[0],
-        "start_time": str(show.start_time)
-      }
-      data.append(show)
-  return render_template('pages/shows.html', shows=data)
-
-@app.route('/shows/create')
+  etag = conditional.list_validator(Show, Venue, Artist)
+  response = conditional.not_modified(etag)
+  if response:
+    return response
+
+  # keyset pagination on (start_time, id): the cursor is the last show of the previous page
+  page_size = _page_size('SHOWS_PER_PAGE', 'SHOWS_MAX_PER_PAGE')
+
+  after_time = None
+  after = request.args.get('after')
+  after_id = request.args.get('after_id', type=int)
+  if after and after_id is not None:
+    try:
+      after_time = datetime.fromisoformat(after)
+    except ValueError:
+      pass
+
+  # ?from=&to=&city=&venue_id=&artist_id=&genre= narrow the listing; like a
+  # bad cursor, malformed filters are ignored
+  try:
+    filters = queries.show_filters(request.args)
+  except ValueError:
+    filters = {}
+
+  # the page reads one extra row to know whether there is a next page
+  args = dict((name, request.args[name]) for name in SHOW_FILTER_ARGS if request.args.get(name))
+  page = KeysetPage(
+      queries.shows_query(after_time, after_id, **filters), page_size,
+      lambda last: url_for('.shows', after=last.start_time.isoformat(), after_id=last.id,
+                           page_size=page_size, **args))
+  return _stream_page('pages/shows.html', etag, page=page)
+
+@main.route('/shows/create')
 def create_shows():
     # renders form. do not touch.
     form = ShowForm()
     return render_template('forms/new_show.html', form=form)
   
-@app.route('/shows/create', methods=['POST'])
+@main.route('/shows/create', methods=['POST'])
 def create_show_submission():
+  if showqueue.queued():
+    return _enqueue_show_submission()
   error = False
+  conflict = False
   body = {}
 
   try:
+    start_time, end_time = _show_times()
     show = Show(
-      artist_id = request.form['artist_id'],
-      venue_id = request.form['venue_id'],
-      start_time = request.form['start_time'],
+      artist_id = int(request.form['artist_id']),
+      venue_id = int(request.form['venue_id']),
+      start_time = start_time,
+      end_time = end_time,
       )
-    db.session.add(show)
-    db.session.commit()
+    # on Postgres the exclusion constraints have the final word; checking
+    # first gives the common case a clear message, and covers SQLite
+    conflict = queries.booking_conflicts(show.venue_id, show.artist_id, start_time, end_time).first() is not None
+    if not conflict:
+      db.session.add(show)
+      db.session.commit()
     
     body['artist_id'] = request.form['artist_id']
     body['venue_id'] = request.form['venue_id']
     body['start_time'] = request.form['start_time']
   except Exception as e:
-          error = True
+          conflict = booking_conflict(e)
+          error = not conflict
           db.session.rollback()
           print(sys.exc_info())
   finally:
           db.session.close()
+  if conflict:
+    flash('The venue or the artist already has a show at that time. Show could not be listed.')
+    return render_template('pages/home.html')
   if error:
     # on unsuccessful db insert, flash an error
     # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
@@ -514,38 +530,168 @@ def create_show_submission():
     flash('Show was successfully listed!')
     return render_template('pages/home.html')
 
-@app.errorhandler(404)
+def _show_times():
+  # end_time is optional, shows last DEFAULT_SHOW_DURATION by default
+  start_time = _parse_datetime(request.form['start_time'])
+  end_time = request.form.get('end_time')
+  end_time = _parse_datetime(end_time) if end_time else start_time + DEFAULT_SHOW_DURATION
+  if end_time <= start_time:
+    raise ValueError('a show must end after it starts')
+  return start_time, end_time
+
+
+def _enqueue_show_submission():
+  # queued write mode (see showqueue.py): validate, record the submission in
+  # the outbox and answer at once; the writer thread creates the show
+  try:
+    venue_id = int(request.form['venue_id'])
+    artist_id = int(request.form['artist_id'])
+    start_time, end_time = _show_times()
+  except (KeyError, ValueError, OverflowError):
+    flash('An error occurred. Show could not be listed.')
+    return render_template('pages/home.html')
+
+  venue_exists, artist_exists = db.session.query(
+    Venue.query.filter_by(id=venue_id).exists(),
+    Artist.query.filter_by(id=artist_id).exists()).one()
+  if not (venue_exists and artist_exists):
+    flash('An error occurred. Show could not be listed, check the venue and artist ids.')
+    return render_template('pages/home.html')
+
+  submission = showqueue.enqueue_show(venue_id, artist_id, start_time, end_time)
+  flash('Show was submitted and will be listed in a moment.')
+  response = make_response(render_template('pages/home.html'), 202)
+  response.headers['Location'] = url_for('api.show_submission', submission_id=submission.id)
+  return response
+
+#  Maintenance
+#  ----------------------------------------------------------------
+
+@main.route('/_status/pool')
+@instrumentation.internal
+def pool_status():
+  # connection pool occupancy and checkout/wait counters of this worker, per engine
+  return jsonify(dbpool.engine_statuses(db.engines))
+
+@main.cli.command('refresh-show-counts')
+@click.option('--minutes', default=15, show_default=True,
+              help='Refresh venues and artists with shows that started in this window.')
+@click.option('--all', 'refresh_all', is_flag=True, help='Recompute the counters of every row.')
+def refresh_show_counts_command(minutes, refresh_all):
+  """Move shows that crossed into the past from the upcoming to the past counters.
+
+  Schedule it (e.g. from cron) at an interval no longer than --minutes.
+  """
+  since = None if refresh_all else datetime.now() - timedelta(minutes=minutes)
+  refresh_show_counts(since=since)
+  db.session.commit()
+
+
+@main.cli.command('explain-queries')
+@click.option('--venue-id', type=int, help='Venue to plan show_venue for (default: the one with most shows).')
+@click.option('--artist-id', type=int, help='Artist to plan show_artist for (default: the one with most shows).')
+@click.option('--no-analyze', is_flag=True, help='Plan only, do not execute the queries.')
+def explain_queries_command(venue_id, artist_id, no_analyze):
+  """Print the query plans of show_venue, show_artist, shows and the booking checks.
+
+  Use it to check that the Show indexes are picked up by the planner.
+  """
+  if venue_id is None:
+    venue_id = db.session.query(Venue.id).order_by(
+      (Venue.upcoming_shows_count + Venue.past_shows_count).desc()).limit(1).scalar()
+  if artist_id is None:
+    artist_id = db.session.query(Artist.id).order_by(
+      (Artist.upcoming_shows_count + Artist.past_shows_count).desc()).limit(1).scalar()
+
+  reports = [
+    ('show_venue (venue_id=%s)' % venue_id, queries.venue_detail_query(venue_id)),
+    ('show_artist (artist_id=%s)' % artist_id, queries.artist_detail_query(artist_id)),
+    ('shows (first page)', queries.shows_query().limit(current_app.config['SHOWS_PER_PAGE'] + 1)),
+  ]
+  # the booking lookups of create_show_submission and the availability API,
+  # which should use the ex_show_*_booking GiST indexes
+  start = datetime.now()
+  end = start + DEFAULT_SHOW_DURATION
+  reports += [
+    ('booking conflicts (venue_id=%s, artist_id=%s)' % (venue_id, artist_id),
+     queries.booking_conflicts(venue_id, artist_id, start, end)),
+    ('venue availability (venue_id=%s, next week)' % venue_id,
+     queries.venue_bookings_query(venue_id, start, start + timedelta(days=7))),
+  ]
+  for title, query in reports:
+    click.echo(title)
+    for line in queries.explain_query(query, analyze=not no_analyze):
+      click.echo('  ' + line)
+    click.echo()
+
+
+@main.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
-@app.errorhandler(500)
+@main.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+#----------------------------------------------------------------------------#
+# Application factory.
+#----------------------------------------------------------------------------#
+
+def _secret_key(app):
+  # every worker must sign sessions (and flashed messages) with the same key
+  if app.config.get('SECRET_KEY'):
+    return app.config['SECRET_KEY']
+  if app.debug or app.testing:
+    app.logger.warning('SECRET_KEY is not set, using a random key for this process')
+    return os.urandom(32)
+  raise RuntimeError('Set the SECRET_KEY environment variable to a secret shared by all workers.')
+
+
+def create_app(config=None):
+  """Build the application; ``config`` overrides settings of config.py."""
+  app = Flask(__name__)
+  app.config.from_object('config')
+  if config:
+    app.config.update(config)
+  app.config['SECRET_KEY'] = _secret_key(app)
+
+  moment.init_app(app)
+  db.init_app(app)
+  routing.init_routing(app)
+  with app.app_context():
+    engines = list(db.engines.values())
+  for engine in engines:
+    dbpool.instrument(engine)
+  instrumentation.init_instrumentation(app, engines)
+  cache.init_cache(app)
+  showqueue.init_show_queue(app)
+  assets.init_assets(app)
+  app.register_blueprint(main)
+  app.register_blueprint(api)
+  app.cli.add_command(bulk.data_cli)
+  app.cli.add_command(benchmark.bench_cli)
+  app.cli.add_command(showqueue.show_queue_cli)
+  app.cli.add_command(assets.assets_cli)
+  migrate.init_app(app, db)
+
+  if not app.debug and not app.testing:
+      file_handler = FileHandler('error.log')
+      file_handler.setFormatter(
+          Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+      )
+      app.logger.setLevel(logging.INFO)
+      file_handler.setLevel(logging.INFO)
+      app.logger.addHandler(file_handler)
+      app.logger.info('errors')
+  return app
 
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
 
-# Default port:
-if __name__ == '__main__':
-    app.run()
-
-# Or specify port manually:
-'''
+# Development server only; production runs wsgi.py under gunicorn:
+#   gunicorn -c gunicorn.conf.py
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
-    
-    
-'''
+    create_app().run(host=os.environ.get('HOST', '127.0.0.1'), port=port)
@@ -0,0 +1,217 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+#----------------------------------------------------------------------------#
+# Static asset pipeline.
+#----------------------------------------------------------------------------#
+
+# The stylesheets and scripts of layouts/main.html are served as three bundles
+# instead of a dozen files. `flask assets build` (also run by gunicorn when it
+# starts, see gunicorn.conf.py) concatenates the files of each bundle,
+# minifies the stylesheets not shipped minified, names the result after a
+# hash of its content (main.3f2a9c1b.css) and writes it with .gz and, when the
+# brotli package is installed, .br variants to ASSETS_FOLDER. Scripts are not
+# minified: the libraries ship minified, and plugins.js, script.js and
+# autocomplete.js add under 3 KB before compression. Files referenced by url()
+# in the stylesheets are fingerprinted and copied alongside. manifest.json
+# maps the bundle names to the built files.
+#
+# /assets/<file> serves the built files, picking the precompressed variant
+# the client accepts, with a one year immutable Cache-Control: a changed
+# bundle gets a new name, so a cached copy never needs revalidating. Templates
+# ask asset_urls('main.css') for the URLs of a bundle, which are the source
+# files in debug or while nothing has been built.
+
+BUNDLES = {
+  'main.css': [
+    'css/bootstrap.min.css',
+    'css/layout.main.css',
+    'css/main.css',
+    'css/main.responsive.css',
+    'css/main.quickfix.css',
+  ],
+  # loaded in <head>, before the page renders
+  'head.js': [
+    'js/libs/modernizr-2.8.2.min.js',
+    'js/libs/moment.min.js',
+  ],
+  # deferred
+  'main.js': [
+    'js/libs/jquery-1.11.1.min.js',
+    'js/libs/bootstrap-3.1.1.min.js',
+    'js/plugins.js',
+    'js/script.js',
+    'js/autocomplete.js',
+  ],
+}
+
+MANIFEST = 'manifest.json'
+# precompressed variants, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+assets_cli = AppGroup('assets', help='Static asset pipeline.')
+
+#  Build
+#  ----------------------------------------------------------------
+
+_CSS_COMMENTS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*(?!!).*?\*/', re.S)
+_CSS_STRINGS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+_CSS_URLS = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def minify_css(source):
+  """Drop comments (but /*! licenses) and the whitespace CSS does not need."""
+  source = _CSS_COMMENTS.sub(lambda match: match.group(1) or '', source)
+  parts = _CSS_STRINGS.split(source)
+  for i in range(0, len(parts), 2):
+    # even parts are outside strings
+    part = re.sub(r'\s+', ' ', parts[i])
+    part = re.sub(r' ?([{};,>]) ?', r'\1', part)
+    parts[i] = part.replace(': ', ':').replace(';}', '}')
+  return ''.join(parts).strip()
+
+
+def _fingerprint(name, content):
+  root, ext = posixpath.splitext(name)
+  return '%s.%s%s' % (root, hashlib.sha256(content).hexdigest()[:8], ext)
+
+
+def _write(output_folder, name, content):
+  path = os.path.join(output_folder, *name.split('/'))
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  variants = [('', content), ('.gz', gzip.compress(content, 9, mtime=0))]
+  if brotli is not None:
+    variants.append(('.br', brotli.compress(content)))
+  for suffix, data in variants:
+    # fingerprinted names never change content, an existing file is complete
+    if not os.path.exists(path + suffix):
+      with open(path + suffix + '.tmp', 'wb') as f:
+        f.write(data)
+      os.replace(path + suffix + '.tmp', path + suffix)
+
+
+def _rewrite_urls(css, source, static_folder, output_folder, manifest):
+  # url()s are relative to the source stylesheet; point them at fingerprinted
+  # copies next to the bundle, or at the static folder when there is no file
+  def rewrite(match):
+    url = match.group(2).strip()
+    if re.match(r'^(?:[a-z]+:|/|#)', url, re.I):
+      return match.group(0)
+    path, suffix = re.match(r'^([^?#]*)(.*)$', url).groups()
+    name = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+    filename = os.path.join(static_folder, *name.split('/'))
+    if not os.path.isfile(filename):
+      return 'url("/static/%s%s")' % (name, suffix)
+    if name not in manifest:
+      with open(filename, 'rb') as f:
+        content = f.read()
+      manifest[name] = _fingerprint(name, content)
+      _write(output_folder, manifest[name], content)
+    return 'url("%s%s")' % (manifest[name], suffix)
+  return _CSS_URLS.sub(rewrite, css)
+
+
+def build(static_folder, output_folder, bundles=BUNDLES):
+  """Write the fingerprinted bundles and their manifest; returns the manifest."""
+  manifest = {}
+  for bundle, sources in sorted(bundles.items()):
+    chunks = []
+    for source in sources:
+      with open(os.path.join(static_folder, *source.split('/')), encoding='utf-8') as f:
+        content = f.read()
+      if bundle.endswith('.css'):
+        if not source.endswith('.min.css'):
+          content = minify_css(content)
+        content = _rewrite_urls(content, source, static_folder, output_folder, manifest)
+      chunks.append(content)
+    # a script may end without a semicolon or inside a // comment
+    content = ('\n' if bundle.endswith('.css') else '\n;\n').join(chunks).encode('utf-8')
+    manifest[bundle] = _fingerprint(bundle, content)
+    _write(output_folder, manifest[bundle], content)
+
+  # written last: the app switches to the new bundles once they all exist
+  path = os.path.join(output_folder, MANIFEST)
+  with open(path + '.tmp', 'w') as f:
+    json.dump(manifest, f, indent=2, sort_keys=True)
+  os.replace(path + '.tmp', path)
+  return manifest
+
+#  Serving
+#  ----------------------------------------------------------------
+
+def _manifest():
+  app = current_app._get_current_object()
+  manifest = app.extensions.get('assets_manifest')
+  if manifest is None:
+    path = os.path.join(app.config['ASSETS_FOLDER'], MANIFEST)
+    if not os.path.exists(path):
+      return None
+    with open(path) as f:
+      manifest = app.extensions['assets_manifest'] = json.load(f)
+  return manifest
+
+
+def asset_urls(bundle):
+  """URLs to load ``bundle`` from: the built file, or its sources."""
+  manifest = None if current_app.debug else _manifest()
+  if manifest and bundle in manifest:
+    return [url_for('asset', filename=manifest[bundle])]
+  return [url_for('static', filename=source) for source in BUNDLES[bundle]]
+
+
+def version():
+  """A digest of the manifest in use, None when pages load the sources."""
+  manifest = None if current_app.debug else _manifest()
+  if not manifest:
+    return None
+  return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode('utf-8')).hexdigest()[:8]
+
+
+def send_asset(filename):
+  folder = current_app.config['ASSETS_FOLDER']
+  for encoding, suffix in ENCODINGS:
+    if request.accept_encodings[encoding] and os.path.isfile(os.path.join(folder, filename + suffix)):
+      break
+  else:
+    encoding, suffix = None, ''
+  response = send_from_directory(folder, filename + suffix, max_age=current_app.config['ASSETS_MAX_AGE'],
+                                 mimetype=mimetypes.guess_type(filename)[0])
+  if encoding:
+    response.content_encoding = encoding
+  response.vary.add('Accept-Encoding')
+  response.cache_control.public = True
+  response.cache_control.immutable = True
+  return response
+
+
+def init_assets(app):
+  app.add_url_rule('/assets/<path:filename>', 'asset', send_asset)
+  app.add_template_global(asset_urls)
+
+#  Commands
+#  ----------------------------------------------------------------
+
+@assets_cli.command('build')
+def build_command():
+  """Bundle, fingerprint and compress the static assets."""
+  manifest = build(current_app.static_folder, current_app.config['ASSETS_FOLDER'])
+  current_app.extensions.pop('assets_manifest', None)
+  for bundle in sorted(BUNDLES):
+    click.echo('%s -> %s' % (bundle, manifest[bundle]))
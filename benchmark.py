@@ -0,0 +1,336 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import json
+import random
+import resource
+import sys
+import time
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event, func
+from forms import ArtistForm
+from models import db, Venue, Artist, Show, DEFAULT_SHOW_DURATION
+import bulk
+import cache
+
+#----------------------------------------------------------------------------#
+# Benchmarks.
+#----------------------------------------------------------------------------#
+
+# `flask bench seed` fills the configured database with synthetic venues,
+# artists and shows (point DATABASE_URL at a scratch database), through the
+# same bulk import as `flask data import`. `flask bench run` then requests
+# every page through the test client and reports p50/p95 latency, SQL
+# statements per request and the peak RSS of the process. --save writes the
+# report as a baseline; --compare checks a run against one and exits with 1
+# when a route got slower than the tolerance or runs more statements. The
+# create handlers insert rows, so they are only benchmarked with --writes,
+# which is meant for a scratch database.
+
+bench_cli = AppGroup('bench', help='Seed synthetic data and benchmark every page.')
+
+WRITE_ROUTES = ('create_venue', 'create_artist', 'create_show')
+
+STATES = [value for value, label in ArtistForm.state.kwargs['choices']]
+GENRES = [value for value, label in ArtistForm.genres.kwargs['choices']]
+WORDS = ['Blue', 'Golden', 'Velvet', 'Electric', 'Hidden', 'Silver', 'Neon', 'Wild',
+         'Echo', 'Lantern', 'Harbor', 'Moon', 'Ember', 'Canyon', 'Static', 'Rose']
+CITIES = ['San Francisco', 'New York', 'Austin', 'Chicago', 'Seattle', 'Nashville',
+          'Denver', 'Portland', 'Boston', 'Atlanta', 'Detroit', 'New Orleans']
+
+
+def _name(rng, i, suffix):
+  return '%s %s %s %d' % (rng.choice(WORDS), rng.choice(WORDS), suffix, i)
+
+
+def _place(rng):
+  return {"city": rng.choice(CITIES), "state": rng.choice(STATES)}
+
+
+def _genres(rng):
+  return rng.sample(GENRES, rng.randint(1, 3))
+
+
+def venue_rows(count, rng):
+  for i in range(count):
+    row = _place(rng)
+    row.update({
+      "name": _name(rng, i, 'Hall'),
+      "address": '%d %s St' % (rng.randint(1, 9999), rng.choice(WORDS)),
+      "phone": '%03d-%03d-%04d' % (rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+      "image_link": 'https://images.example.com/venues/%d.jpg' % i,
+      "facebook_link": 'https://www.facebook.com/venue%d' % i,
+      "seeking_talent": rng.random() < 0.3,
+      "genres": _genres(rng),
+    })
+    yield row
+
+
+def artist_rows(count, rng):
+  for i in range(count):
+    row = _place(rng)
+    row.update({
+      "name": _name(rng, i, 'Band'),
+      "phone": '%03d-%03d-%04d' % (rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+      "image_link": 'https://images.example.com/artists/%d.jpg' % i,
+      "facebook_link": 'https://www.facebook.com/artist%d' % i,
+      "seeking_venue": rng.random() < 0.3,
+      "genres": _genres(rng),
+    })
+    yield row
+
+
+def show_rows(count, venue_ids, artist_ids, rng, days=365):
+  # spread over a year either side of now, so pages have past and upcoming
+  # shows; shows are laid out in rounds in which every venue and every artist
+  # plays at most once, and rounds are further apart than a show lasts, so
+  # nothing is double-booked
+  now = datetime.now().replace(minute=0, second=0, microsecond=0)
+  venues = venue_ids[1] - venue_ids[0] + 1
+  artists = artist_ids[1] - artist_ids[0] + 1
+  per_round = min(venues, artists)
+  rounds = max(1, -(-count // per_round))
+  spacing = max(DEFAULT_SHOW_DURATION, timedelta(days=2 * days) / rounds)
+  jitter = int((spacing - DEFAULT_SHOW_DURATION).total_seconds() // 60)
+  first = now - timedelta(days=days)
+  for i in range(count):
+    start_time = first + (i // per_round) * spacing + timedelta(minutes=rng.randint(0, jitter))
+    yield {
+      "venue_id": venue_ids[0] + i % venues,
+      "artist_id": artist_ids[0] + (i + i // per_round) % artists,
+      "start_time": start_time,
+      "end_time": start_time + DEFAULT_SHOW_DURATION,
+    }
+
+
+def _id_range(model):
+  return db.session.query(func.min(model.id), func.max(model.id)).one()
+
+
+def seed(venues, artists, shows, seed=0, batch_size=10000):
+  """Insert synthetic rows; shows reference the existing venues and artists."""
+  rng = random.Random(seed)
+  counts = {}
+  counts['venues'] = bulk.import_rows(Venue, venue_rows(venues, rng), batch_size)[0]
+  counts['artists'] = bulk.import_rows(Artist, artist_rows(artists, rng), batch_size)[0]
+  db.session.commit()
+  venue_ids, artist_ids = _id_range(Venue), _id_range(Artist)
+  if shows and None not in venue_ids and None not in artist_ids:
+    # ids are drawn from the min/max range, so gaps from deletes are skipped
+    rows = show_rows(shows, venue_ids, artist_ids, rng)
+    counts['shows'] = bulk.import_rows(Show, rows, batch_size, skip_invalid=True)[0]
+    db.session.commit()
+  return counts
+
+#  Routes
+#  ----------------------------------------------------------------
+
+def _search_term():
+  name = db.session.query(Venue.name).order_by(Venue.id).limit(1).scalar() or 'a'
+  return name.split()[0]
+
+
+def _free_from(venue_id, artist_id):
+  # after the last show of the venue and of the artist, so the created shows
+  # are not rejected as double bookings
+  last = db.session.query(func.max(Show.end_time)) \
+    .filter((Show.venue_id == venue_id) | (Show.artist_id == artist_id)).scalar()
+  start = datetime.now() + timedelta(days=30)
+  return max(start, last + timedelta(days=1)) if last else start
+
+
+def routes():
+  """(name, method, url, form data) of every page, using existing ids.
+
+  The form data may be a function of the iteration, returning the form.
+  """
+  venue_id = db.session.query(func.min(Venue.id)).scalar()
+  artist_id = db.session.query(func.min(Artist.id)).scalar()
+  term = _search_term()
+  free_from = _free_from(venue_id, artist_id)
+  venue_form = {
+    "name": 'Bench Venue', "city": 'Austin', "state": 'TX', "address": '1 Main St',
+    "phone": '512-555-0100', "image_link": 'https://images.example.com/v.jpg',
+    "genres": ['Jazz', 'Blues'], "facebook_link": 'https://www.facebook.com/bench',
+    "website": 'https://bench.example.com',
+  }
+  artist_form = {
+    "name": 'Bench Artist', "city": 'Austin', "state": 'TX', "phone": '512-555-0101',
+    "image_link": 'https://images.example.com/a.jpg', "genres": ['Rock n Roll'],
+    "facebook_link": 'https://www.facebook.com/bench', "website": 'https://bench.example.com',
+  }
+
+  def show_form(i):
+    # a new slot every iteration, so each one creates a show
+    start_time = free_from + i * (DEFAULT_SHOW_DURATION + timedelta(hours=1))
+    return {"venue_id": venue_id, "artist_id": artist_id,
+            "start_time": start_time.strftime('%Y-%m-%d %H:%M:%S')}
+  return [
+    ('home', 'GET', '/', None),
+    ('venues', 'GET', '/venues', None),
+    ('venue', 'GET', '/venues/%s' % venue_id, None),
+    ('artists', 'GET', '/artists', None),
+    ('artist', 'GET', '/artists/%s' % artist_id, None),
+    ('shows', 'GET', '/shows', None),
+    ('search_venues', 'POST', '/venues/search', {"search_term": term}),
+    ('search_artists', 'POST', '/artists/search', {"search_term": term}),
+    ('create_venue', 'POST', '/venues/create', venue_form),
+    ('create_artist', 'POST', '/artists/create', artist_form),
+    ('create_show', 'POST', '/shows/create', show_form),
+  ]
+
+
+class _StatementCounter(object):
+
+  def __init__(self, engines):
+    self.engines = engines
+    self.count = 0
+
+  def _count(self, *args):
+    self.count += 1
+
+  def __enter__(self):
+    for engine in self.engines:
+      event.listen(engine, 'before_cursor_execute', self._count)
+    return self
+
+  def __exit__(self, *exc_info):
+    for engine in self.engines:
+      event.remove(engine, 'before_cursor_execute', self._count)
+
+
+def _percentile(values, fraction):
+  values = sorted(values)
+  return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def _peak_rss_mb():
+  # ru_maxrss is in kilobytes on Linux and bytes on macOS
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def run(app, repeat=20, only=None, writes=False):
+  """Request every route ``repeat`` times; returns the report as a dict.
+
+  The create handlers are skipped unless ``writes`` is set.
+  """
+  with app.app_context():
+    engines = list(db.engines.values())
+    targets = routes()
+  # the app is changed for the run only, and restored even if a route fails
+  csrf_enabled = app.config.get('WTF_CSRF_ENABLED', True)
+  page_cache = app.extensions['page_cache']
+  log_level = app.logger.level
+  app.config['WTF_CSRF_ENABLED'] = False
+  # the page cache would measure cache hits after the first request
+  app.extensions['page_cache'] = cache.NullCache()
+  # keep the per-request log lines of instrumentation.py out of the report
+  app.logger.setLevel('WARNING')
+
+  report = {"routes": {}, "repeat": repeat}
+  try:
+    for name, method, url, data in targets:
+      if only and name not in only:
+        continue
+      if name in WRITE_ROUTES and not writes:
+        continue
+      # a fresh client per route, so flashed messages of the create handlers
+      # and read-your-writes pinning do not leak into the next route
+      client = app.test_client()
+      timings, statements, statuses = [], [], set()
+      for i in range(repeat):
+        with _StatementCounter(engines) as counter:
+          started = time.perf_counter()
+          response = client.open(url, method=method, data=data(i) if callable(data) else data)
+          response.get_data()
+          timings.append(time.perf_counter() - started)
+          response.close()
+        statements.append(counter.count)
+        statuses.add(response.status_code)
+      report['routes'][name] = {
+        "url": url,
+        "p50_ms": round(_percentile(timings, 0.5) * 1000, 2),
+        "p95_ms": round(_percentile(timings, 0.95) * 1000, 2),
+        "queries": max(statements),
+        "status": sorted(statuses),
+      }
+  finally:
+    app.logger.setLevel(log_level)
+    app.extensions['page_cache'] = page_cache
+    app.config['WTF_CSRF_ENABLED'] = csrf_enabled
+  with app.app_context():
+    report['rows'] = {model.__tablename__: db.session.query(func.count(model.id)).scalar()
+                      for model in (Venue, Artist, Show)}
+  report['peak_rss_mb'] = round(_peak_rss_mb(), 1)
+  return report
+
+
+def compare(report, baseline, tolerance):
+  """Return the regressions of ``report`` against ``baseline``, as text lines."""
+  regressions = []
+  for name, result in sorted(report['routes'].items()):
+    base = baseline['routes'].get(name)
+    if base is None:
+      continue
+    if result['queries'] > base['queries']:
+      regressions.append('%s: %d queries, baseline %d' % (name, result['queries'], base['queries']))
+    if result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+      regressions.append('%s: p95 %.2fms, baseline %.2fms' % (name, result['p95_ms'], base['p95_ms']))
+  return regressions
+
+#  Commands
+#  ----------------------------------------------------------------
+
+@bench_cli.command('seed')
+@click.option('--venues', default=10000, show_default=True)
+@click.option('--artists', default=50000, show_default=True)
+@click.option('--shows', default=1000000, show_default=True)
+@click.option('--seed', 'random_seed', default=0, show_default=True, help='Seed of the random generator.')
+@click.option('--batch-size', default=10000, show_default=True)
+def seed_command(venues, artists, shows, random_seed, batch_size):
+  """Insert synthetic venues, artists and shows into the configured database."""
+  started = time.perf_counter()
+  counts = seed(venues, artists, shows, seed=random_seed, batch_size=batch_size)
+  click.echo('seeded %s in %.1fs' % (
+    ', '.join('%d %s' % (count, what) for what, count in counts.items()),
+    time.perf_counter() - started))
+
+
+@bench_cli.command('run')
+@click.option('--repeat', default=20, show_default=True, help='Requests per route.')
+@click.option('--route', 'only', multiple=True, help='Only benchmark this route (repeatable).')
+@click.option('--save', type=click.File('w'), help='Write the report as a baseline.')
+@click.option('--compare', 'baseline', type=click.File('r'), help='Baseline to compare against.')
+@click.option('--tolerance', default=0.2, show_default=True,
+              help='Allowed p95 slowdown against the baseline, as a fraction.')
+@click.option('--writes', is_flag=True,
+              help='Also benchmark the create handlers; they insert rows, use a scratch database.')
+def run_command(repeat, only, save, baseline, tolerance, writes):
+  """Benchmark every page through the test client."""
+  app = current_app._get_current_object()
+  if not writes:
+    click.echo('skipping %s, they need --writes and a scratch database' % ', '.join(WRITE_ROUTES), err=True)
+  report = run(app, repeat=repeat, only=only, writes=writes)
+
+  click.echo('%-16s %10s %10s %8s  %s' % ('route', 'p50 ms', 'p95 ms', 'queries', 'status'))
+  for name, result in report['routes'].items():
+    click.echo('%-16s %10.2f %10.2f %8d  %s' % (
+      name, result['p50_ms'], result['p95_ms'], result['queries'],
+      ','.join(str(status) for status in result['status'])))
+  click.echo('rows: %s, peak RSS %.1f MB' % (
+    ', '.join('%s=%d' % item for item in sorted(report['rows'].items())), report['peak_rss_mb']))
+
+  if save:
+    json.dump(report, save, indent=2, sort_keys=True)
+    save.write('\n')
+  if baseline:
+    regressions = compare(report, json.load(baseline), tolerance)
+    for line in regressions:
+      click.echo('REGRESSION ' + line, err=True)
+    if regressions:
+      sys.exit(1)
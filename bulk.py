@@ -0,0 +1,436 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+import time
+from datetime import datetime
+from itertools import islice
+import click
+from flask.cli import AppGroup
+from sqlalchemy import Boolean, DateTime, Integer, func, or_, select, text
+import queries
+from models import db, Venue, Artist, Show, Genre, DEFAULT_SHOW_DURATION, venue_genres, artist_genres, \
+  booking_conflict, refresh_show_counts
+
+#----------------------------------------------------------------------------#
+# Bulk import / export.
+#----------------------------------------------------------------------------#
+
+# `flask data import|export venues|artists|shows FILE` moves CSV or NDJSON in
+# and out of the database. Input is read and written in batches so memory
+# stays flat whatever the file size. On Postgres each batch is loaded with
+# COPY; other databases get a batched executemany. Show rows are checked
+# against Venue and Artist one batch at a time, and against the bookings of
+# their venues and artists (including the rows imported before them) as
+# showqueue.py does, so an overlapping show is reported by row instead of
+# aborting a COPY on the exclusion constraints. The show counters are
+# refreshed for the venues and artists involved. Venue and artist genres are
+# linked through the Genre table, creating unknown genres on the way.
+
+MODELS = {'venues': Venue, 'artists': Artist, 'shows': Show}
+
+# maintained by the database or the show counters, never imported or exported
+DERIVED_COLUMNS = {'upcoming_shows_count', 'past_shows_count', 'updated_at'}
+
+# genres travel as a comma separated 'genres' field (a list in NDJSON) and are
+# stored in these association tables
+GENRE_TABLES = {Venue: (venue_genres, 'venue_id'), Artist: (artist_genres, 'artist_id')}
+
+data_cli = AppGroup('data', help='Bulk import and export of venues, artists and shows.')
+
+
+class BulkError(click.ClickException):
+  pass
+
+
+def _columns(model):
+  return [column for column in model.__table__.columns if column.name not in DERIVED_COLUMNS]
+
+
+def _format(file, fmt):
+  if fmt:
+    return fmt
+  name = getattr(file, 'name', '') or ''
+  return 'ndjson' if name.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+#  Values
+#  ----------------------------------------------------------------
+
+def _parse_list(value):
+  if isinstance(value, list):
+    return value
+  return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _parse_bool(value):
+  if isinstance(value, bool):
+    return value
+  return str(value).strip().lower() in ('1', 't', 'true', 'y', 'yes')
+
+
+def _parse_datetime(value):
+  if isinstance(value, datetime):
+    return value
+  import dateutil.parser
+  return dateutil.parser.parse(value)
+
+
+def _parse_str(value):
+  return str(value)
+
+
+def _parser(column):
+  if isinstance(column.type, Boolean):
+    return _parse_bool
+  if isinstance(column.type, DateTime):
+    return _parse_datetime
+  if isinstance(column.type, Integer):
+    return int
+  return _parse_str
+
+
+def _copy_value(value):
+  # text representation COPY ... (FORMAT csv) expects; None stays an unquoted NULL
+  if isinstance(value, bool):
+    return 't' if value else 'f'
+  if isinstance(value, datetime):
+    return value.isoformat()
+  return value
+
+#  Import
+#  ----------------------------------------------------------------
+
+def _read(file, fmt):
+  if fmt == 'ndjson':
+    for line in file:
+      if line.strip():
+        yield json.loads(line)
+  else:
+    for row in csv.DictReader(file):
+      yield row
+
+
+def _typed_rows(rows, model):
+  parsers = {column.name: _parser(column) for column in _columns(model)}
+  if model in GENRE_TABLES:
+    parsers['genres'] = _parse_list
+  for line, row in enumerate(rows, 1):
+    unknown = set(row) - set(parsers)
+    if unknown:
+      raise BulkError('row %d: unknown column(s) %s' % (line, ', '.join(sorted(unknown))))
+    try:
+      yield {
+        name: (None if value is None or value == '' else parsers[name](value))
+        for name, value in row.items()
+      }
+    except (TypeError, ValueError) as e:
+      raise BulkError('row %d: %s' % (line, e))
+
+
+def _batches(rows, size):
+  rows = iter(rows)
+  while True:
+    batch = list(islice(rows, size))
+    if not batch:
+      return
+    yield batch
+
+
+def _missing_ids(connection, model, ids):
+  found = set(connection.execute(select(model.id).where(model.id.in_(ids))).scalars())
+  return ids - found
+
+
+def _check_shows(connection, batch, skip_invalid):
+  """Drop (or reject) shows whose venue or artist does not exist."""
+  missing_venues = _missing_ids(connection, Venue, {row.get('venue_id') for row in batch})
+  missing_artists = _missing_ids(connection, Artist, {row.get('artist_id') for row in batch})
+  if not missing_venues and not missing_artists:
+    return batch, 0
+  valid = [row for row in batch
+           if row.get('venue_id') not in missing_venues and row.get('artist_id') not in missing_artists]
+  if not skip_invalid:
+    raise BulkError('unknown venue ids %s / artist ids %s (use --skip-invalid to drop those shows)' % (
+      sorted(missing_venues, key=str)[:10], sorted(missing_artists, key=str)[:10]))
+  return valid, len(batch) - len(valid)
+
+
+def _booked(connection, batch):
+  # intervals already booked by the venues and artists of the batch, in one query
+  timed = [row for row in batch if row.get('start_time') is not None]
+  booked = {}
+  if not timed:
+    return booked
+  rows = connection.execute(
+    select(Show.venue_id, Show.artist_id, Show.start_time, Show.end_time)
+    .where(or_(Show.venue_id.in_({row['venue_id'] for row in timed}),
+               Show.artist_id.in_({row['artist_id'] for row in timed})),
+           queries.overlaps(Show.start_time, Show.end_time,
+                            min(row['start_time'] for row in timed),
+                            max(row['end_time'] for row in timed)))
+  ).all()
+  for row in rows:
+    _book(booked, row.venue_id, row.artist_id, row.start_time, row.end_time)
+  return booked
+
+
+def _book(booked, venue_id, artist_id, start, end):
+  for key in (('venue', venue_id), ('artist', artist_id)):
+    booked.setdefault(key, []).append((start, end))
+
+
+def _check_bookings(connection, batch, skip_invalid):
+  """Drop (or reject) shows overlapping a show of their venue or artist."""
+  booked = _booked(connection, batch)
+  valid = []
+  for row in batch:
+    start, end = row.get('start_time'), row.get('end_time')
+    if start is not None and any(
+        booked_start < end and booked_end > start
+        for key in (('venue', row['venue_id']), ('artist', row['artist_id']))
+        for booked_start, booked_end in booked.get(key, ())):
+      if not skip_invalid:
+        raise BulkError('show of venue %s and artist %s at %s overlaps another booking '
+                        '(use --skip-invalid to drop those shows)' % (row['venue_id'], row['artist_id'], start))
+      continue
+    if start is not None:
+      _book(booked, row['venue_id'], row['artist_id'], start, end)
+    valid.append(row)
+  return valid, len(batch) - len(valid)
+
+
+def _copy_from(connection, table, names, batch):
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  for row in batch:
+    writer.writerow([_copy_value(row.get(name)) for name in names])
+  sql = 'COPY "%s" (%s) FROM STDIN WITH (FORMAT csv)' % (
+    table.name, ', '.join('"%s"' % name for name in names))
+
+  cursor = connection.connection.cursor()
+  try:
+    if hasattr(cursor, 'copy_expert'):  # psycopg2
+      buffer.seek(0)
+      cursor.copy_expert(sql, buffer)
+    else:  # psycopg 3
+      with cursor.copy(sql) as copy:
+        copy.write(buffer.getvalue())
+  finally:
+    cursor.close()
+
+
+def _allocate_ids(connection, table, count):
+  return list(connection.execute(text(
+    'SELECT nextval(pg_get_serial_sequence(\'"%s"\', \'id\')) FROM generate_series(1, :count)'
+    % table.name), {'count': count}).scalars())
+
+
+def _genre_ids(connection, names):
+  """Map genre names to ids, inserting the genres not seen before."""
+  existing = dict(connection.execute(
+    select(Genre.name, Genre.id).where(Genre.name.in_(names))).all())
+  missing = sorted(set(names) - set(existing))
+  if missing:
+    connection.execute(Genre.__table__.insert(), [{'name': name} for name in missing])
+    existing.update(connection.execute(
+      select(Genre.name, Genre.id).where(Genre.name.in_(missing))).all())
+  return existing
+
+
+def _insert(connection, table, names, batch, use_copy):
+  try:
+    if use_copy:
+      _copy_from(connection, table, names, batch)
+    else:
+      connection.execute(table.insert(), [{name: row.get(name) for name in names} for row in batch])
+  except Exception as e:
+    # a show booked by another writer since the batch was checked; COPY
+    # raises the driver's error
+    if booking_conflict(e):
+      raise BulkError('a show overlaps a booking made during the import, nothing was imported')
+    raise
+
+
+def import_rows(model, rows, batch_size=10000, skip_invalid=False):
+  """Insert ``rows`` (dicts keyed by column name) into ``model``'s table.
+
+  Returns ``(imported, skipped)``. The caller commits.
+  """
+  connection = db.session.connection()
+  table = model.__table__
+  use_copy = connection.dialect.name == 'postgresql'
+  imported = skipped = 0
+  venue_ids, artist_ids = set(), set()
+  with_ids = False
+
+  for batch in _batches(_typed_rows(rows, model), batch_size):
+    if model is Show:
+      batch, dropped = _check_shows(connection, batch, skip_invalid)
+      skipped += dropped
+      # COPY bypasses the column default of end_time
+      for row in batch:
+        if row.get('end_time') is None and row.get('start_time') is not None:
+          row['end_time'] = row['start_time'] + DEFAULT_SHOW_DURATION
+      batch, dropped = _check_bookings(connection, batch, skip_invalid)
+      skipped += dropped
+      venue_ids.update(row['venue_id'] for row in batch)
+      artist_ids.update(row['artist_id'] for row in batch)
+    if not batch:
+      continue
+
+    genres = [row.pop('genres', None) or [] for row in batch]
+    names = [column.name for column in _columns(model) if any(column.name in row for row in batch)]
+    with_ids = with_ids or 'id' in names
+
+    if any(genres) and 'id' not in names:
+      # the association rows need the new ids
+      if use_copy:
+        for row, new_id in zip(batch, _allocate_ids(connection, table, len(batch))):
+          row['id'] = new_id
+        _insert(connection, table, ['id'] + names, batch, use_copy)
+      else:
+        new_ids = connection.execute(
+          table.insert().returning(table.c.id, sort_by_parameter_order=True),
+          [{name: row.get(name) for name in names} for row in batch]).scalars()
+        for row, new_id in zip(batch, new_ids):
+          row['id'] = new_id
+    else:
+      _insert(connection, table, names, batch, use_copy)
+
+    if any(genres):
+      genre_table, owner = GENRE_TABLES[model]
+      genre_ids = _genre_ids(connection, {name for row_genres in genres for name in row_genres})
+      links = [{owner: row['id'], 'genre_id': genre_ids[name]}
+               for row, row_genres in zip(batch, genres) for name in set(row_genres)]
+      _insert(connection, genre_table, [owner, 'genre_id'], links, use_copy)
+    imported += len(batch)
+
+  if with_ids and use_copy:
+    # explicit ids bypass the sequence, move it past them
+    connection.execute(text(
+      'SELECT setval(pg_get_serial_sequence(\'"%s"\', \'id\'), coalesce(max(id), 1)) FROM "%s"'
+      % (table.name, table.name)))
+  if model is Show and imported:
+    refresh_show_counts(connection, venue_ids=venue_ids, artist_ids=artist_ids)
+  return imported, skipped
+
+#  Export
+#  ----------------------------------------------------------------
+
+def _json_default(value):
+  if isinstance(value, datetime):
+    return value.isoformat()
+  raise TypeError('%r is not JSON serializable' % (value,))
+
+
+def _export_select(model):
+  columns = list(_columns(model))
+  if model in GENRE_TABLES:
+    genre_table, owner = GENRE_TABLES[model]
+    columns.append(
+      select(func.aggregate_strings(Genre.name, ','))
+      .select_from(genre_table.join(Genre, Genre.id == genre_table.c.genre_id))
+      .where(genre_table.c[owner] == model.id)
+      .scalar_subquery().label('genres'))
+  return select(*columns).order_by(model.id)
+
+
+def export_rows(model, file, fmt, batch_size=10000):
+  """Write every row of ``model``'s table to ``file``; returns the row count."""
+  statement = _export_select(model)
+  names = [column.name for column in statement.selected_columns]
+  connection = db.session.connection()
+
+  if fmt == 'csv' and connection.dialect.name == 'postgresql':
+    sql = 'COPY (%s) TO STDOUT WITH (FORMAT csv, HEADER)' % statement.compile(
+      dialect=connection.dialect, compile_kwargs={'literal_binds': True})
+    cursor = connection.connection.cursor()
+    try:
+      if hasattr(cursor, 'copy_expert'):  # psycopg2
+        cursor.copy_expert(sql, _TextWriter(file))
+      else:  # psycopg 3
+        with cursor.copy(sql) as copy:
+          for data in copy:
+            file.write(bytes(data).decode('utf-8'))
+      # the row count of the COPY command tag; counting newlines would
+      # miscount quoted multi-line values such as seeking_description
+      return cursor.rowcount
+    finally:
+      cursor.close()
+
+  result = connection.execution_options(stream_results=True, yield_per=batch_size) \
+    .execute(statement)
+  writer = csv.writer(file) if fmt == 'csv' else None
+  if writer:
+    writer.writerow(names)
+  exported = 0
+  for row in result:
+    if writer:
+      writer.writerow([_copy_value(value) for value in row])
+    else:
+      data = dict(zip(names, row))
+      if 'genres' in data:
+        data['genres'] = data['genres'].split(',') if data['genres'] else []
+      file.write(json.dumps(data, default=_json_default) + '\n')
+    exported += 1
+  return exported
+
+
+class _TextWriter(io.TextIOBase):
+  # psycopg2 writes bytes to anything that is not a TextIOBase
+
+  def __init__(self, file):
+    self.file = file
+
+  def writable(self):
+    return True
+
+  def write(self, data):
+    return self.file.write(data)
+
+#  Commands
+#  ----------------------------------------------------------------
+
+def _report(verb, count, what, started, skipped=0):
+  elapsed = max(time.perf_counter() - started, 1e-9)
+  message = '%s %d %s in %.2fs (%d rows/s)' % (verb, count, what, elapsed, count / elapsed)
+  if skipped:
+    message += ', skipped %d with unknown venue/artist or overlapping another show' % skipped
+  click.echo(message, err=True)
+
+
+@data_cli.command('import')
+@click.argument('what', type=click.Choice(sorted(MODELS)))
+@click.argument('file', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help='Input format (default: from the file extension, else csv).')
+@click.option('--batch-size', default=10000, show_default=True)
+@click.option('--skip-invalid', is_flag=True,
+              help='Drop shows with an unknown venue or artist, or overlapping another show, instead of aborting.')
+def import_command(what, file, fmt, batch_size, skip_invalid):
+  """Import venues, artists or shows from a CSV or NDJSON FILE ('-' for stdin)."""
+  started = time.perf_counter()
+  try:
+    imported, skipped = import_rows(MODELS[what], _read(file, _format(file, fmt)),
+                                    batch_size=batch_size, skip_invalid=skip_invalid)
+    db.session.commit()
+  except Exception:
+    db.session.rollback()
+    raise
+  _report('imported', imported, what, started, skipped)
+
+
+@data_cli.command('export')
+@click.argument('what', type=click.Choice(sorted(MODELS)))
+@click.argument('file', type=click.File('w', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help='Output format (default: from the file extension, else csv).')
+@click.option('--batch-size', default=10000, show_default=True)
+def export_command(what, file, fmt, batch_size):
+  """Export venues, artists or shows to a CSV or NDJSON FILE ('-' for stdout)."""
+  started = time.perf_counter()
+  exported = export_rows(MODELS[what], file, _format(file, fmt), batch_size=batch_size)
+  _report('exported', exported, what, started)
@@ -0,0 +1,132 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+import conditional
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+class NullCache(object):
+  """Caches nothing; used when CACHE_TYPE is 'null'."""
+
+  def get(self, key):
+    return None
+
+  def set(self, key, value, timeout):
+    pass
+
+  def delete(self, *keys):
+    pass
+
+
+class LRUCache(object):
+  """In-process cache bounded by size, evicting the least recently used entry."""
+
+  def __init__(self, threshold=500):
+    self.threshold = threshold
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return None
+      expires_at, value = entry
+      if expires_at <= time.time():
+        del self._entries[key]
+        return None
+      self._entries.move_to_end(key)
+      return value
+
+  def set(self, key, value, timeout):
+    with self._lock:
+      self._entries[key] = (time.time() + timeout, value)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.threshold:
+        self._entries.popitem(last=False)
+
+  def delete(self, *keys):
+    with self._lock:
+      for key in keys:
+        self._entries.pop(key, None)
+
+
+class RedisCache(object):
+  """Cache shared by all workers, stored in a Redis-compatible server."""
+
+  def __init__(self, url, key_prefix='fyyur:'):
+    import redis
+    self._client = redis.Redis.from_url(url)
+    self.key_prefix = key_prefix
+
+  def get(self, key):
+    value = self._client.get(self.key_prefix + key)
+    return None if value is None else pickle.loads(value)
+
+  def set(self, key, value, timeout):
+    self._client.setex(self.key_prefix + key, max(int(timeout), 1), pickle.dumps(value))
+
+  def delete(self, *keys):
+    if keys:
+      self._client.delete(*[self.key_prefix + key for key in keys])
+
+
+def init_cache(app):
+  cache_type = app.config.get('CACHE_TYPE', 'lru')
+  if cache_type == 'redis':
+    backend = RedisCache(app.config['CACHE_REDIS_URL'])
+  elif cache_type == 'lru':
+    backend = LRUCache(app.config.get('CACHE_THRESHOLD', 500))
+  else:
+    backend = NullCache()
+  app.extensions['page_cache'] = backend
+  return backend
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+# Detail pages are cached as rendered HTML keyed by entity and by the ETag of
+# conditional.py ('venue:1:<etag>'). The ETag changes with any edit of the
+# page's rows, so a changed page never hits an entry rendered before the
+# change, whichever worker or process made it: nothing has to be
+# invalidated, and old versions are evicted or expire. An entry never outlives
+# the start of the next upcoming show on the page either, so the past/upcoming
+# split is always current.
+
+def _backend():
+  return current_app.extensions['page_cache']
+
+
+def get_page(key):
+  # pages carry the flashed messages of the layout, so never serve or
+  # store them while a message is pending
+  if conditional.pending_flashes():
+    return None
+  return _backend().get(key)
+
+
+def set_page(key, html, expires_at=None):
+  if conditional.pending_flashes():
+    return
+  timeout = current_app.config.get('CACHE_DEFAULT_TIMEOUT', 300)
+  if expires_at is not None:
+    timeout = min(timeout, expires_at - time.time())
+  if timeout > 0:
+    _backend().set(key, html, timeout)
+
+
+def venue_key(venue_id, etag):
+  return 'venue:%s:%s' % (venue_id, etag)
+
+
+def artist_key(artist_id, etag):
+  return 'artist:%s:%s' % (artist_id, etag)
@@ -0,0 +1,124 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import hashlib
+from datetime import datetime
+from flask import current_app, g, make_response, message_flashed, request, session
+from sqlalchemy import case, func, select
+from werkzeug.http import is_resource_modified
+from models import db, Venue, Artist, Show
+import assets
+
+#----------------------------------------------------------------------------#
+# Conditional requests.
+#----------------------------------------------------------------------------#
+
+# ETags are computed from the updated_at columns with one aggregate query,
+# before any page data is loaded, so a matching If-None-Match is answered with
+# a 304 without querying shows in full or rendering a template. The ETags
+# include the asset manifest in use: pages link to fingerprinted bundles, so a
+# deploy that rebuilds them must not leave browsers revalidating HTML that
+# points at removed files. No Last-Modified is sent: the latest updated_at
+# stays the same across a delete, a show moving into the past or a rebuild of
+# the assets, which only the ETag notices.
+
+def _validator(values):
+  return hashlib.sha1(repr((assets.version(),) + tuple(values)).encode('utf-8')).hexdigest()
+
+
+def _detail_validator(model, show_fk, other, other_fk, key):
+  # the page also lists the names of the other side of each show, and splits
+  # shows into past and upcoming, so both feed the validator
+  row = db.session.query(
+      model.updated_at,
+      func.max(Show.updated_at),
+      func.max(other.updated_at),
+      func.count(Show.id),
+      func.sum(case((Show.start_time > datetime.now(), 1), else_=0))
+  ).outerjoin(Show, show_fk == model.id) \
+   .outerjoin(other, other_fk == other.id) \
+   .filter(model.id == key) \
+   .group_by(model.id, model.updated_at).first()
+
+  if row is None:
+    return None
+  return _validator((model.__tablename__, key) + tuple(row))
+
+
+def venue_validator(venue_id):
+  """Return the ETag of a venue page, or None if there is no such venue."""
+  return _detail_validator(Venue, Show.venue_id, Artist, Show.artist_id, venue_id)
+
+
+def artist_validator(artist_id):
+  """Return the ETag of an artist page, or None if there is no such artist."""
+  return _detail_validator(Artist, Show.artist_id, Venue, Show.venue_id, artist_id)
+
+
+def list_validator(*models, params=()):
+  """Return the ETag of a page listing rows of ``models``.
+
+  Uses the latest updated_at and the row count (to notice deletes) of each
+  table, in a single statement. ``params`` are the resolved arguments the
+  page also depends on, such as a window defaulting to the current time.
+  """
+  columns = []
+  for model in models:
+    columns.append(select(func.max(model.updated_at)).scalar_subquery())
+    columns.append(select(func.count(model.id)).scalar_subquery())
+  row = db.session.execute(select(*columns)).first()
+  return _validator(tuple(row) + tuple(params))
+
+#----------------------------------------------------------------------------#
+# Responses.
+#----------------------------------------------------------------------------#
+
+def _flashed(app, message, category, **extra):
+  g.flashed = True
+
+
+message_flashed.connect(_flashed)
+
+
+def pending_flashes():
+  """Whether flashed messages wait to be shown. The session is only read if
+  the request carries one: reading it adds Vary: Cookie to the response, which
+  keeps shared caches from storing it."""
+  if g.get('flashed'):
+    return True
+  if 'session_flashes' not in g:
+    # remembered, as streamed pages pop them before the layout renders
+    g.session_flashes = current_app.config['SESSION_COOKIE_NAME'] in request.cookies and \
+        bool(session.get('_flashes'))
+  return g.session_flashes
+
+
+def _cacheable():
+  # pages carry the flashed messages of the layout
+  return not pending_flashes()
+
+
+def not_modified(etag):
+  """Return a 304 response if the client's copy is current, else None."""
+  if etag is None or not _cacheable():
+    return None
+  if is_resource_modified(request.environ, etag=etag):
+    return None
+  return respond('', etag, status=304)
+
+
+def apply(response, etag):
+  """Set the ETag and Cache-Control on a response."""
+  if _cacheable():
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config.get('HTTP_CACHE_MAX_AGE', 0)
+    response.cache_control.must_revalidate = True
+  else:
+    response.cache_control.no_store = True
+  return response
+
+
+def respond(body, etag, status=200):
+  return apply(make_response(body, status), etag)
@@ -1,13 +1,115 @@
 import os
-SECRET_KEY = os.urandom(32)
+from sqlalchemy.pool import NullPool
+from dbpool import TimedQueuePool
+# Signs sessions and flashed messages; must be the same in every worker.
+# Without it the app only starts in debug mode, with a per-process key.
+SECRET_KEY = os.environ.get('SECRET_KEY')
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# Enable debug mode (FLASK_DEBUG=1); never in production.
+DEBUG = os.environ.get('FLASK_DEBUG') == '1'
 
 # Connect to the database
 
 
-# TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgresql://nourah@localhost:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://nourah@localhost:5432/fyyur')
+
+# Engine and connection pool, per worker process. Size the pool so that
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays below max_connections.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+# seconds a request waits for a free connection before failing
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+# seconds after which a connection is replaced, below any server/LB idle timeout
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 5000))
+# PgBouncer in transaction mode: it does the pooling, so keep no connections
+# here, and it rejects startup options, so set statement_timeout on the role
+DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER') == '1'
+
+# Read replicas, comma separated. GET requests and searches read from them
+# (see routing.py).
+SQLALCHEMY_BINDS = {
+  'replica_%d' % i: url.strip()
+  for i, url in enumerate(os.environ.get('DATABASE_REPLICA_URLS', '').split(','))
+  if url.strip()
+}
+# skip a replica lagging more than this, re-checked every REPLICA_LAG_CHECK_INTERVAL
+REPLICA_MAX_LAG_SECONDS = int(os.environ.get('REPLICA_MAX_LAG_SECONDS', 10))
+REPLICA_LAG_CHECK_INTERVAL = 5
+# after a write, the client reads from the primary for this long
+READ_YOUR_WRITES_SECONDS = 10
+
+SQLALCHEMY_ENGINE_OPTIONS = {}
+if SQLALCHEMY_DATABASE_URI.startswith('postgres'):
+  if DB_PGBOUNCER:
+    SQLALCHEMY_ENGINE_OPTIONS = {'poolclass': NullPool}
+  else:
+    SQLALCHEMY_ENGINE_OPTIONS = {
+      'poolclass': TimedQueuePool,
+      'pool_size': DB_POOL_SIZE,
+      'max_overflow': DB_MAX_OVERFLOW,
+      'pool_timeout': DB_POOL_TIMEOUT,
+      'pool_recycle': DB_POOL_RECYCLE,
+      # drop connections that died with a failover instead of erroring a request
+      'pool_pre_ping': True,
+      'connect_args': {'options': '-c statement_timeout=%d' % DB_STATEMENT_TIMEOUT_MS},
+    }
+
+# Number of shows rendered per page on /shows, and the upper bound a
+# ?page_size= argument may request.
+SHOWS_PER_PAGE = 50
+SHOWS_MAX_PER_PAGE = 200
+
+# Rows fetched per round trip by the streamed lists (the /api/v1 lists and the
+# /venues, /artists and /shows pages), through server-side cursors on Postgres.
+STREAM_BATCH_SIZE = 1000
+
+# Same as SHOWS_PER_PAGE for the artists listed per page on /artists.
+ARTISTS_PER_PAGE = 100
+ARTISTS_MAX_PER_PAGE = 500
+
+# Maximum number of rows returned by /venues/search and /artists/search.
+SEARCH_RESULTS_LIMIT = 50
+
+# Prefix autocomplete of the new show form (see search.py): names returned per
+# prefix, and how many prefixes are cached per process and for how long.
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_CACHE_THRESHOLD = 1000
+AUTOCOMPLETE_CACHE_TIMEOUT = 60
+
+# Page cache for the venue and artist detail pages: 'lru' (in-process),
+# 'redis' (shared by all workers, needs the redis package) or 'null'.
+CACHE_TYPE = os.environ.get('CACHE_TYPE', 'lru')
+CACHE_DEFAULT_TIMEOUT = 300
+CACHE_THRESHOLD = 500
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+# max-age sent with the ETag of venue, artist and show pages;
+# clients and the CDN revalidate once it has passed.
+HTTP_CACHE_MAX_AGE = int(os.environ.get('HTTP_CACHE_MAX_AGE', 60))
+
+# Request instrumentation (see instrumentation.py): log a warning for requests
+# running more SQL statements than this, and send Server-Timing headers.
+SQL_QUERY_WARNING_THRESHOLD = int(os.environ.get('SQL_QUERY_WARNING_THRESHOLD', 20))
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') == '1'
+# /metrics and /_status/pool answer only requests sending
+# 'Authorization: Bearer <METRICS_TOKEN>', and do not exist without a token
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Show creation: 'sync' inserts the show in the request; 'queued' records the
+# submission in an outbox and a writer thread per worker creates the shows in
+# batches, rejecting double bookings of a venue or artist (see showqueue.py).
+SHOW_WRITE_MODE = os.environ.get('SHOW_WRITE_MODE', 'sync')
+SHOW_QUEUE_BATCH_SIZE = 100
+# seconds the writer waits after a submission, so a burst becomes one batch
+SHOW_QUEUE_FLUSH_INTERVAL = 0.5
+# seconds between checks for submissions left pending by another process
+SHOW_QUEUE_POLL_INTERVAL = 5
+
+# Static asset pipeline (see assets.py): where `flask assets build` writes the
+# fingerprinted bundles, and how long clients may cache them (a year; a new
+# build gets new file names).
+ASSETS_FOLDER = os.environ.get('ASSETS_FOLDER', os.path.join(basedir, 'static', 'dist'))
+ASSETS_MAX_AGE = 365 * 24 * 3600
@@ -0,0 +1,129 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+import weakref
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+#----------------------------------------------------------------------------#
+# Connection pool.
+#----------------------------------------------------------------------------#
+
+# The engine options are built in config.py from the environment. This module
+# adds what SQLAlchemy does not report on its own: how many connections were
+# opened, checked out, invalidated (e.g. by pre-ping after a failover), and
+# how long requests waited for a connection. Each engine (the primary and
+# every replica) has counters of its own.
+
+class PoolMetrics(object):
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.connects = 0
+    self.checkouts = 0
+    self.checkins = 0
+    self.invalidations = 0
+    self.timeouts = 0
+    self.wait_seconds_total = 0.0
+    self.wait_seconds_max = 0.0
+
+  def incr(self, name, amount=1):
+    with self._lock:
+      setattr(self, name, getattr(self, name) + amount)
+
+  def record_wait(self, seconds):
+    with self._lock:
+      self.wait_seconds_total += seconds
+      self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+  def snapshot(self):
+    with self._lock:
+      return {
+        "connects": self.connects,
+        "checkouts": self.checkouts,
+        "checkins": self.checkins,
+        "invalidations": self.invalidations,
+        "timeouts": self.timeouts,
+        "wait_seconds_total": self.wait_seconds_total,
+        "wait_seconds_max": self.wait_seconds_max,
+      }
+
+
+_engine_metrics = weakref.WeakKeyDictionary()
+
+
+class TimedQueuePool(QueuePool):
+  """QueuePool that records how long each checkout waited for a connection."""
+
+  def __init__(self, *args, **kwargs):
+    super(TimedQueuePool, self).__init__(*args, **kwargs)
+    self.metrics = PoolMetrics()
+
+  def recreate(self):
+    # engine.dispose() replaces the pool, the counters carry on
+    pool = super(TimedQueuePool, self).recreate()
+    pool.metrics = self.metrics
+    return pool
+
+  def _do_get(self):
+    start = time.perf_counter()
+    try:
+      return super(TimedQueuePool, self)._do_get()
+    except exc.TimeoutError:
+      self.metrics.incr('timeouts')
+      raise
+    finally:
+      self.metrics.record_wait(time.perf_counter() - start)
+
+
+def metrics_of(engine):
+  """The PoolMetrics of ``engine``."""
+  metrics = _engine_metrics.get(engine)
+  if metrics is None:
+    metrics = _engine_metrics[engine] = getattr(engine.pool, 'metrics', None) or PoolMetrics()
+  return metrics
+
+
+def instrument(engine):
+  """Count connection lifecycle events of ``engine``'s pool."""
+  pool = engine.pool
+  metrics = metrics_of(engine)
+
+  @event.listens_for(pool, 'connect')
+  def _connect(dbapi_connection, connection_record):
+    metrics.incr('connects')
+
+  @event.listens_for(pool, 'checkout')
+  def _checkout(dbapi_connection, connection_record, connection_proxy):
+    metrics.incr('checkouts')
+
+  @event.listens_for(pool, 'checkin')
+  def _checkin(dbapi_connection, connection_record):
+    metrics.incr('checkins')
+
+  @event.listens_for(pool, 'invalidate')
+  def _invalidate(dbapi_connection, connection_record, exception):
+    metrics.incr('invalidations')
+
+
+def status(engine):
+  """Current pool occupancy plus the counters collected by instrument()."""
+  pool = engine.pool
+  data = {"pool": pool.__class__.__name__}
+  if isinstance(pool, QueuePool):
+    data.update({
+      "size": pool.size(),
+      "checked_in": pool.checkedin(),
+      "checked_out": pool.checkedout(),
+      "overflow": pool.overflow(),
+    })
+  data.update(metrics_of(engine).snapshot())
+  return data
+
+
+def engine_statuses(engines):
+  """status() of Flask-SQLAlchemy's ``db.engines``, by name ('primary', 'replica_0', ...)."""
+  return {key or 'primary': status(engine) for key, engine in engines.items()}
@@ -1,14 +1,23 @@
+import os
+
 from fabric.api import local, settings, abort
 from fabric.contrib.console import confirm
 
+BENCH_BASELINE = 'benchmarks/baseline.json'
+
 # prepare for deployment
 
 
 def test():
+    # query-count tests on in-memory SQLite, then the pages against the
+    # saved benchmark baseline when there is one, see benchmark.py
+    command = "python -m pytest -q tests"
+    if os.path.exists(BENCH_BASELINE):
+        command += " && flask bench run --compare " + BENCH_BASELINE
+    else:
+        print("No %s, skipping the benchmark comparison." % BENCH_BASELINE)
     with settings(warn_only=True):
-        result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
-        )
+        result = local(command, capture=True)
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
@@ -39,9 +48,7 @@ def heroku():
 
 
 def heroku_test():
-    local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
-    )
+    local("heroku run python -m pytest -q tests")
 
 
 def deploy():
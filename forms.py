@@ -1,8 +1,8 @@
 from datetime import datetime
 #from flask_wtf import Form
-from flask_wtf import Form as BaseForm
+from flask_wtf import FlaskForm as BaseForm
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms.validators import DataRequired, Optional, URL
 
 class ShowForm(BaseForm):
     artist_id = StringField(
@@ -16,6 +16,10 @@ class ShowForm(BaseForm):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    end_time = DateTimeField(
+        'end_time',
+        validators=[Optional()]
+    )
     artist_name = StringField(
     'artist_name'
     )
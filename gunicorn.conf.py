@@ -0,0 +1,51 @@
+#----------------------------------------------------------------------------#
+# gunicorn settings.
+#----------------------------------------------------------------------------#
+
+# All of them can be overridden from the environment (e.g. WEB_CONCURRENCY on
+# Heroku). Keep threads <= DB_POOL_SIZE + DB_MAX_OVERFLOW, so a busy worker
+# does not wait for a connection, and workers * (DB_POOL_SIZE +
+# DB_MAX_OVERFLOW) below the database's max_connections.
+
+import multiprocessing
+import os
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('BIND', '0.0.0.0:%s' % os.environ.get('PORT', '5000'))
+
+# import the app, templates' loader and SQLAlchemy mappers once in the
+# master; forked workers share those pages copy-on-write and start at once
+preload_app = True
+
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# threads overlap the time requests spend waiting on the database
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+# recycle workers now and then, jittered so they do not restart together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+  # connections opened in the master (none normally, but a preload hook or
+  # a replica lag check could) must not be shared between processes
+  from wsgi import app
+  from models import db
+  with app.app_context():
+    for engine in db.engines.values():
+      engine.dispose(close=False)
+
+
+def on_starting(server):
+  # fingerprinted, compressed static bundles (see assets.py); workers switch
+  # to them through the manifest, written once every bundle is in place
+  import assets
+  from wsgi import app
+  assets.build(app.static_folder, app.config['ASSETS_FOLDER'])
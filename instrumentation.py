@@ -0,0 +1,257 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import functools
+import hmac
+import json
+import threading
+import time
+from collections import defaultdict
+from flask import Response, abort, before_render_template, current_app, g, has_request_context, request, \
+  template_rendered
+from sqlalchemy import event
+import dbpool
+from models import db
+
+#----------------------------------------------------------------------------#
+# Request instrumentation.
+#----------------------------------------------------------------------------#
+
+# Every request records its wall time, the number and duration of the SQL
+# statements it ran (cursor events of every engine, replicas included) and
+# the time spent rendering templates. They are sent back as a Server-Timing
+# header, logged as one JSON line through app.logger (the error.log handler
+# outside debug), and summed per endpoint for the Prometheus /metrics page.
+# A request running more than SQL_QUERY_WARNING_THRESHOLD statements is
+# logged as a warning: it is most likely loading a relationship per row.
+#
+# Streamed responses (the /api/v1 lists and the /venues, /artists and /shows
+# pages) run most of their queries and their rendering after after_request:
+# their Server-Timing header covers the time to the first byte, and they are
+# logged and counted once the body has been sent, when the response is
+# closed.
+#
+# /metrics exposes the endpoints and the database pools of the worker, so it
+# is only served to clients presenting METRICS_TOKEN.
+
+# upper bounds, in seconds, of the request duration histogram
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics(object):
+  """Per-worker totals of the measured requests, by endpoint."""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.requests = defaultdict(int)
+    self.buckets = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))
+    self.seconds = defaultdict(float)
+    self.sql_statements = defaultdict(int)
+    self.sql_seconds = defaultdict(float)
+    self.template_seconds = defaultdict(float)
+
+  def record(self, endpoint, method, status, seconds, sql_statements, sql_seconds, template_seconds):
+    with self._lock:
+      self.requests[(endpoint, method, status)] += 1
+      buckets = self.buckets[endpoint]
+      for i, bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= bound:
+          buckets[i] += 1
+      self.seconds[endpoint] += seconds
+      self.sql_statements[endpoint] += sql_statements
+      self.sql_seconds[endpoint] += sql_seconds
+      self.template_seconds[endpoint] += template_seconds
+
+  def snapshot(self):
+    with self._lock:
+      return {
+        "requests": dict(self.requests),
+        "buckets": dict((key, list(value)) for key, value in self.buckets.items()),
+        "seconds": dict(self.seconds),
+        "sql_statements": dict(self.sql_statements),
+        "sql_seconds": dict(self.sql_seconds),
+        "template_seconds": dict(self.template_seconds),
+      }
+
+
+metrics = RequestMetrics()
+
+
+def _stats():
+  if 'request_stats' not in g:
+    g.request_stats = {"sql_statements": 0, "sql_seconds": 0.0, "template_seconds": 0.0}
+  return g.request_stats
+
+
+def instrument_engine(engine):
+  """Count the statements ``engine`` runs for the current request."""
+
+  @event.listens_for(engine, 'before_cursor_execute')
+  def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+  @event.listens_for(engine, 'after_cursor_execute')
+  def _after(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    if has_request_context():
+      stats = _stats()
+      stats['sql_statements'] += 1
+      stats['sql_seconds'] += elapsed
+
+  @event.listens_for(engine, 'handle_error')
+  def _failed(exception_context):
+    # a failed statement never reaches after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_start'):
+      conn.info['query_start'].pop()
+
+
+def _render_started(sender, template, context, **extra):
+  g.setdefault('template_start', []).append(time.perf_counter())
+
+
+def _rendered(sender, template, context, **extra):
+  starts = g.get('template_start')
+  if starts:
+    _stats()['template_seconds'] += time.perf_counter() - starts.pop()
+
+
+def _server_timing(stats, seconds):
+  return ', '.join([
+    'db;dur=%.2f;desc="%d queries"' % (stats['sql_seconds'] * 1000, stats['sql_statements']),
+    'tpl;dur=%.2f' % (stats['template_seconds'] * 1000),
+    'total;dur=%.2f' % (seconds * 1000),
+  ])
+
+
+def init_instrumentation(app, engines):
+  """Measure every request of ``app`` and serve the totals at /metrics."""
+  for engine in engines:
+    instrument_engine(engine)
+  before_render_template.connect(_render_started, app)
+  template_rendered.connect(_rendered, app)
+
+  @app.before_request
+  def _start():
+    g.request_start = time.perf_counter()
+    g.request_stats = {"sql_statements": 0, "sql_seconds": 0.0, "template_seconds": 0.0}
+
+  @app.after_request
+  def _finish(response):
+    if 'request_start' not in g:
+      return response
+    started = g.request_start
+    # the same dict keeps counting while a streamed body is generated
+    stats = _stats()
+    seconds = time.perf_counter() - started
+    if app.config.get('SERVER_TIMING', True):
+      response.headers['Server-Timing'] = _server_timing(stats, seconds)
+
+    entry = {
+      "method": request.method,
+      "path": request.path,
+      "endpoint": request.endpoint or 'unmatched',
+      "status": response.status_code,
+    }
+    if response.is_streamed:
+      response.call_on_close(lambda: _log(app, entry, stats, time.perf_counter() - started))
+    else:
+      _log(app, entry, stats, seconds)
+    return response
+
+  @app.route('/metrics')
+  @internal
+  def prometheus_metrics():
+    # Prometheus text format; counters are per worker process
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+def internal(view):
+  """Serve ``view`` only to requests carrying the METRICS_TOKEN bearer token."""
+
+  @functools.wraps(view)
+  def wrapper(*args, **kwargs):
+    token = current_app.config.get('METRICS_TOKEN')
+    if not token:
+      abort(404)
+    expected = ('Bearer ' + token).encode('utf-8')
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode('utf-8'), expected):
+      abort(401)
+    return view(*args, **kwargs)
+  return wrapper
+
+
+def _log(app, entry, stats, seconds):
+  metrics.record(entry['endpoint'], entry['method'], entry['status'], seconds,
+                 stats['sql_statements'], stats['sql_seconds'], stats['template_seconds'])
+  line = json.dumps(dict(entry, **{
+    "duration_ms": round(seconds * 1000, 2),
+    "sql_statements": stats['sql_statements'],
+    "sql_ms": round(stats['sql_seconds'] * 1000, 2),
+    "template_ms": round(stats['template_seconds'] * 1000, 2),
+  }))
+  threshold = app.config.get('SQL_QUERY_WARNING_THRESHOLD')
+  if threshold and stats['sql_statements'] > threshold:
+    app.logger.warning('too many queries: %s', line)
+  else:
+    app.logger.info('request: %s', line)
+
+#----------------------------------------------------------------------------#
+# Prometheus exposition.
+#----------------------------------------------------------------------------#
+
+def _labels(**labels):
+  return '{%s}' % ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                           for name, value in sorted(labels.items()))
+
+
+def _family(lines, name, kind, help, samples):
+  lines.append('# HELP %s %s' % (name, help))
+  lines.append('# TYPE %s %s' % (name, kind))
+  for suffix, labels, value in samples:
+    lines.append('%s%s%s %s' % (name, suffix, _labels(**labels) if labels else '', repr(float(value))))
+
+
+def render_metrics():
+  """Request, SQL, template and connection pool metrics in Prometheus format."""
+  data = metrics.snapshot()
+  lines = []
+
+  _family(lines, 'fyyur_requests_total', 'counter', 'Requests served.', [
+    ('', {"endpoint": endpoint, "method": method, "status": status}, count)
+    for (endpoint, method, status), count in sorted(data['requests'].items())
+  ])
+
+  samples = []
+  for endpoint, buckets in sorted(data['buckets'].items()):
+    count = sum(value for (name, method, status), value in data['requests'].items() if name == endpoint)
+    for bound, value in zip(LATENCY_BUCKETS, buckets):
+      samples.append(('_bucket', {"endpoint": endpoint, "le": bound}, value))
+    samples.append(('_bucket', {"endpoint": endpoint, "le": '+Inf'}, count))
+    samples.append(('_sum', {"endpoint": endpoint}, data['seconds'][endpoint]))
+    samples.append(('_count', {"endpoint": endpoint}, count))
+  _family(lines, 'fyyur_request_duration_seconds', 'histogram', 'Request duration.', samples)
+
+  for name, key, help in (
+      ('fyyur_sql_statements_total', 'sql_statements', 'SQL statements run by requests.'),
+      ('fyyur_sql_seconds_total', 'sql_seconds', 'Time requests spent in SQL statements.'),
+      ('fyyur_template_seconds_total', 'template_seconds', 'Time requests spent rendering templates.')):
+    _family(lines, name, 'counter', help, [
+      ('', {"endpoint": endpoint}, value) for endpoint, value in sorted(data[key].items())
+    ])
+
+  # one sample per engine, labelled 'primary' or by its replica bind key
+  pools = sorted(dbpool.engine_statuses(db.engines).items())
+  for name in ('size', 'checked_in', 'checked_out', 'overflow'):
+    samples = [('', {"engine": engine}, pool[name]) for engine, pool in pools if name in pool]
+    if samples:
+      _family(lines, 'fyyur_db_pool_' + name, 'gauge', 'Connection pool %s.' % name.replace('_', ' '), samples)
+  for name in ('connects', 'checkouts', 'checkins', 'invalidations', 'timeouts', 'wait_seconds'):
+    key = name + '_total' if name == 'wait_seconds' else name
+    _family(lines, 'fyyur_db_pool_%s_total' % name, 'counter', 'Connection pool %s.' % name.replace('_', ' '),
+            [('', {"engine": engine}, pool[key]) for engine, pool in pools])
+  _family(lines, 'fyyur_db_pool_wait_seconds_max', 'gauge', 'Longest wait for a pooled connection.',
+          [('', {"engine": engine}, pool['wait_seconds_max']) for engine, pool in pools])
+
+  return '\n'.join(lines) + '\n'
@@ -0,0 +1,89 @@
+"""Genre lookup table replacing Venue.genres and Artist.genres
+
+Revision ID: 2e7a9c15b8f3
+Revises: f6b8d1c49e02
+Create Date: 2026-10-18 13:02:18.640215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2e7a9c15b8f3'
+down_revision = 'f6b8d1c49e02'
+branch_labels = None
+depends_on = None
+
+
+# every genre name of a row, whether stored as an array (Venue) or as a
+# comma joined string (Artist, and what the old form handlers wrote)
+VENUE_GENRE_NAMES = "unnest(string_to_array(array_to_string(v.genres, ','), ','))"
+ARTIST_GENRE_NAMES = "unnest(string_to_array(a.genres, ','))"
+
+
+def upgrade():
+    op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('venue_genres',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id', 'genre_id')
+    )
+    op.create_index('ix_venue_genres_genre_id_venue_id', 'venue_genres', ['genre_id', 'venue_id'], unique=False)
+    op.create_table('artist_genres',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+    sa.PrimaryKeyConstraint('artist_id', 'genre_id')
+    )
+    op.create_index('ix_artist_genres_genre_id_artist_id', 'artist_genres', ['genre_id', 'artist_id'], unique=False)
+
+    op.execute(
+        'INSERT INTO "Genre" (name) '
+        'SELECT DISTINCT trim(name) FROM ('
+        '  SELECT ' + VENUE_GENRE_NAMES + ' AS name FROM "Venue" v'
+        '  UNION ALL'
+        '  SELECT ' + ARTIST_GENRE_NAMES + ' AS name FROM "Artist" a'
+        ') names WHERE trim(name) <> \'\''
+    )
+    op.execute(
+        'INSERT INTO venue_genres (venue_id, genre_id) '
+        'SELECT DISTINCT names.id, g.id FROM ('
+        '  SELECT v.id, trim(' + VENUE_GENRE_NAMES + ') AS name FROM "Venue" v'
+        ') names JOIN "Genre" g ON g.name = names.name'
+    )
+    op.execute(
+        'INSERT INTO artist_genres (artist_id, genre_id) '
+        'SELECT DISTINCT names.id, g.id FROM ('
+        '  SELECT a.id, trim(' + ARTIST_GENRE_NAMES + ') AS name FROM "Artist" a'
+        ') names JOIN "Genre" g ON g.name = names.name'
+    )
+
+    op.drop_column('Venue', 'genres')
+    op.drop_column('Artist', 'genres')
+
+
+def downgrade():
+    op.add_column('Artist', sa.Column('genres', sa.VARCHAR(length=120), autoincrement=False, nullable=True))
+    op.add_column('Venue', sa.Column('genres', sa.ARRAY(sa.String()), autoincrement=False, nullable=True))
+    op.execute(
+        'UPDATE "Venue" v SET genres = (SELECT array_agg(g.name ORDER BY g.name) '
+        'FROM venue_genres vg JOIN "Genre" g ON g.id = vg.genre_id WHERE vg.venue_id = v.id)'
+    )
+    op.execute(
+        'UPDATE "Artist" a SET genres = (SELECT string_agg(g.name, \',\' ORDER BY g.name) '
+        'FROM artist_genres ag JOIN "Genre" g ON g.id = ag.genre_id WHERE ag.artist_id = a.id)'
+    )
+    op.drop_index('ix_artist_genres_genre_id_artist_id', table_name='artist_genres')
+    op.drop_table('artist_genres')
+    op.drop_index('ix_venue_genres_genre_id_venue_id', table_name='venue_genres')
+    op.drop_table('venue_genres')
+    op.drop_table('Genre')
@@ -0,0 +1,35 @@
+"""Trigram GiST search indexes, so searches are ranked from the index
+
+Revision ID: 3f8c6e1a9b47
+Revises: d1f7b3a8c264
+Create Date: 2026-10-18 19:12:37.540118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8c6e1a9b47'
+down_revision = 'd1f7b3a8c264'
+branch_labels = None
+depends_on = None
+
+
+# Must match search._document(), otherwise the planner cannot use the index.
+SEARCH_DOCUMENT = "(coalesce(name, '') || ' ' || coalesce(city, '') || ' ' || coalesce(state, ''))"
+
+
+# GiST, unlike the GIN indexes it replaces, also answers ORDER BY <-> LIMIT.
+def upgrade():
+    op.execute('CREATE INDEX ix_venue_search_trgm_gist ON "Venue" USING gist (' + SEARCH_DOCUMENT + ' gist_trgm_ops)')
+    op.execute('CREATE INDEX ix_artist_search_trgm_gist ON "Artist" USING gist (' + SEARCH_DOCUMENT + ' gist_trgm_ops)')
+    op.execute('DROP INDEX IF EXISTS ix_artist_search_trgm')
+    op.execute('DROP INDEX IF EXISTS ix_venue_search_trgm')
+
+
+def downgrade():
+    op.execute('CREATE INDEX ix_venue_search_trgm ON "Venue" USING gin (' + SEARCH_DOCUMENT + ' gin_trgm_ops)')
+    op.execute('CREATE INDEX ix_artist_search_trgm ON "Artist" USING gin (' + SEARCH_DOCUMENT + ' gin_trgm_ops)')
+    op.execute('DROP INDEX IF EXISTS ix_artist_search_trgm_gist')
+    op.execute('DROP INDEX IF EXISTS ix_venue_search_trgm_gist')
@@ -0,0 +1,31 @@
+"""trigram search indexes on Venue and Artist
+
+Revision ID: 5b1f0c9ad3e7
+Revises: c773d844031e
+Create Date: 2026-10-18 09:12:31.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1f0c9ad3e7'
+down_revision = 'c773d844031e'
+branch_labels = None
+depends_on = None
+
+
+# Must match search._document(), otherwise the planner cannot use the index.
+SEARCH_DOCUMENT = "(coalesce(name, '') || ' ' || coalesce(city, '') || ' ' || coalesce(state, ''))"
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute('CREATE INDEX ix_venue_search_trgm ON "Venue" USING gin (' + SEARCH_DOCUMENT + ' gin_trgm_ops)')
+    op.execute('CREATE INDEX ix_artist_search_trgm ON "Artist" USING gin (' + SEARCH_DOCUMENT + ' gin_trgm_ops)')
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS ix_artist_search_trgm')
+    op.execute('DROP INDEX IF EXISTS ix_venue_search_trgm')
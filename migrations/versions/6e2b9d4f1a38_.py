@@ -0,0 +1,27 @@
+"""Artist listing index on coalesce(lower(name), ''), so nameless artists can be paged
+
+Revision ID: 6e2b9d4f1a38
+Revises: 3f8c6e1a9b47
+Create Date: 2026-10-18 21:04:51.208317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e2b9d4f1a38'
+down_revision = '3f8c6e1a9b47'
+branch_labels = None
+depends_on = None
+
+
+# Must match queries.artist_page_query(), otherwise the listing is sorted.
+def upgrade():
+    op.drop_index('ix_artist_lower_name_id', table_name='Artist')
+    op.create_index('ix_artist_lower_name_id', 'Artist', [sa.text("coalesce(lower(name), '')"), 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_artist_lower_name_id', table_name='Artist')
+    op.create_index('ix_artist_lower_name_id', 'Artist', [sa.text('lower(name)'), 'id'], unique=False)
@@ -0,0 +1,38 @@
+"""ShowSubmission outbox of queued show creation
+
+Revision ID: 7c1d3f9a5e20
+Revises: 2e7a9c15b8f3
+Create Date: 2026-10-18 15:21:44.118302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1d3f9a5e20'
+down_revision = '2e7a9c15b8f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ShowSubmission',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('status', sa.String(length=16), server_default='pending', nullable=False),
+    sa.Column('show_id', sa.Integer(), nullable=True),
+    sa.Column('message', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['show_id'], ['Show.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_show_submission_status_id', 'ShowSubmission', ['status', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_submission_status_id', table_name='ShowSubmission')
+    op.drop_table('ShowSubmission')
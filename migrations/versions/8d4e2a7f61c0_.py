@@ -0,0 +1,35 @@
+"""upcoming/past show counters on Venue and Artist
+
+Revision ID: 8d4e2a7f61c0
+Revises: 5b1f0c9ad3e7
+Create Date: 2026-10-18 10:03:54.118630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4e2a7f61c0'
+down_revision = '5b1f0c9ad3e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table, fk in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+        # backfill from the existing shows
+        op.execute(
+            'UPDATE "{table}" SET '
+            'upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{fk} = "{table}".id AND "Show".start_time > now()), '
+            'past_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{fk} = "{table}".id AND "Show".start_time <= now())'
+            .format(table=table, fk=fk)
+        )
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
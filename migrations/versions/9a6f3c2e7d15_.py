@@ -0,0 +1,28 @@
+"""Prefix indexes on lower(name) for the artist and venue autocomplete
+
+Revision ID: 9a6f3c2e7d15
+Revises: b4e8a2d6c913
+Create Date: 2026-10-18 17:25:41.208316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a6f3c2e7d15'
+down_revision = 'b4e8a2d6c913'
+branch_labels = None
+depends_on = None
+
+
+# Must match search._autocomplete(): lower(name) LIKE 'prefix%'. text_pattern_ops
+# lets the btree serve LIKE prefixes whatever the database collation is.
+def upgrade():
+    op.execute('CREATE INDEX ix_venue_name_prefix ON "Venue" (lower(name) text_pattern_ops)')
+    op.execute('CREATE INDEX ix_artist_name_prefix ON "Artist" (lower(name) text_pattern_ops)')
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS ix_artist_name_prefix')
+    op.execute('DROP INDEX IF EXISTS ix_venue_name_prefix')
@@ -0,0 +1,30 @@
+"""composite indexes on Show
+
+Revision ID: a3c9e5d27b14
+Revises: 8d4e2a7f61c0
+Create Date: 2026-10-18 10:41:07.553902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c9e5d27b14'
+down_revision = '8d4e2a7f61c0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_id_start_time', 'Show', ['venue_id', 'start_time'],
+                    unique=False, postgresql_include=['artist_id'])
+    op.create_index('ix_show_artist_id_start_time', 'Show', ['artist_id', 'start_time'],
+                    unique=False, postgresql_include=['venue_id'])
+    op.create_index('ix_show_start_time_id', 'Show', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_start_time_id', table_name='Show')
+    op.drop_index('ix_show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='Show')
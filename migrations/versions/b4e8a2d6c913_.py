@@ -0,0 +1,61 @@
+"""Show.end_time and exclusion constraints against double bookings
+
+Revision ID: b4e8a2d6c913
+Revises: 7c1d3f9a5e20
+Create Date: 2026-10-18 16:40:03.552871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4e8a2d6c913'
+down_revision = '7c1d3f9a5e20'
+branch_labels = None
+depends_on = None
+
+
+# existing shows get the default duration of models.DEFAULT_SHOW_DURATION
+DEFAULT_DURATION = "interval '2 hours'"
+
+OVERLAPS = '''
+    SELECT count(*) FROM "Show" a JOIN "Show" b
+      ON a.{column} = b.{column} AND a.id < b.id
+     AND tsrange(a.start_time, a.end_time) && tsrange(b.start_time, b.end_time)
+'''
+
+
+def upgrade():
+    # btree_gist provides the = operator of integer columns in a GiST index
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.execute('UPDATE "Show" SET end_time = start_time + %s WHERE start_time IS NOT NULL' % DEFAULT_DURATION)
+    op.add_column('ShowSubmission', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.execute('UPDATE "ShowSubmission" SET end_time = start_time + %s' % DEFAULT_DURATION)
+    op.alter_column('ShowSubmission', 'end_time', nullable=False)
+
+    # the constraints cannot be added over existing double bookings; list
+    # them instead of deleting shows behind the scheduling staff's back
+    connection = op.get_bind()
+    for column in ('venue_id', 'artist_id'):
+        overlapping = connection.execute(sa.text(OVERLAPS.format(column=column))).scalar()
+        if overlapping:
+            raise RuntimeError(
+                '%d pairs of shows with the same %s overlap; move or delete them, then upgrade again. '
+                'They are listed by: %s' % (overlapping, column, OVERLAPS.format(column=column).replace(
+                    'count(*)', 'a.id, b.id').strip()))
+
+    for name, column in (('ex_show_venue_booking', 'venue_id'), ('ex_show_artist_booking', 'artist_id')):
+        op.execute(
+            'ALTER TABLE "Show" ADD CONSTRAINT %s EXCLUDE USING gist '
+            '(%s WITH =, tsrange(start_time, end_time) WITH &&) '
+            'WHERE (start_time IS NOT NULL AND end_time IS NOT NULL)' % (name, column))
+
+
+def downgrade():
+    op.drop_constraint('ex_show_artist_booking', 'Show')
+    op.drop_constraint('ex_show_venue_booking', 'Show')
+    op.drop_column('ShowSubmission', 'end_time')
+    op.drop_column('Show', 'end_time')
@@ -0,0 +1,24 @@
+"""Index on Artist (lower(name), id) for the paginated /artists listing
+
+Revision ID: d1f7b3a8c264
+Revises: 9a6f3c2e7d15
+Create Date: 2026-10-18 18:02:16.774905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1f7b3a8c264'
+down_revision = '9a6f3c2e7d15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_artist_lower_name_id', 'Artist', [sa.text('lower(name)'), 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_artist_lower_name_id', table_name='Artist')
@@ -0,0 +1,26 @@
+"""updated_at on Venue, Artist and Show
+
+Revision ID: f6b8d1c49e02
+Revises: a3c9e5d27b14
+Create Date: 2026-10-18 11:26:40.871355
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b8d1c49e02'
+down_revision = 'a3c9e5d27b14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist', 'Show'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False))
+
+
+def downgrade():
+    for table in ('Show', 'Artist', 'Venue'):
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,276 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, func, inspect, select, text
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
+from routing import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+# genre filters look rows up by genre, hence the (genre_id, owner) indexes
+venue_genres = db.Table('venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
+
+artist_genres = db.Table('artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Index('ix_artist_genres_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    genres = db.relationship('Genre', secondary=venue_genres, order_by=Genre.name, lazy=True)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    website = db.Column(db.String(500))
+    seeking_talent = db.Column(db.Boolean)
+    seeking_description = db.Column(db.String)
+    # maintained by the Show events below and refresh_show_counts()
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=func.now())
+    Shows = db.relationship('Show',backref='Venue',lazy=True)
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String())
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=artist_genres, order_by=Genre.name, lazy=True)
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    website = db.Column(db.String())
+    seeking_venue = db.Column(db.Boolean)
+    seeking_description = db.Column(db.String())
+    # maintained by the Show events below and refresh_show_counts()
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=func.now())
+    shows = db.relationship('Show', backref='Artist',lazy=True)
+
+    __table_args__ = (
+        # keyset order and jump-to-letter of the /artists listing; a NULL name
+        # sorts as '', a keyset comparison with NULL is never true
+        db.Index('ix_artist_lower_name_id', func.coalesce(func.lower(name), ''), id),
+    )
+
+# length of a show whose end_time is not given
+DEFAULT_SHOW_DURATION = timedelta(hours=2)
+
+
+def _default_end_time(context):
+  start_time = context.get_current_parameters().get('start_time')
+  return start_time + DEFAULT_SHOW_DURATION if start_time is not None else None
+
+
+def _bookings(name, column):
+  # no two shows of the same venue (or artist) may overlap; Postgres only,
+  # enforced by a GiST index (btree_gist provides the = on the id)
+  return ExcludeConstraint(
+    (column, '='), (func.tsrange(text('start_time'), text('end_time')), '&&'),
+    name=name, using='gist', where=text('start_time IS NOT NULL AND end_time IS NOT NULL'),
+  ).ddl_if(dialect='postgresql')
+
+
+def booking_conflict(error):
+  """Whether ``error`` is a violation of the booking exclusion constraints.
+
+  Takes a SQLAlchemy error or the driver's own, as raised by COPY on a raw
+  cursor.
+  """
+  orig = getattr(error, 'orig', error)
+  # psycopg2 and psycopg 3 name the SQLSTATE differently
+  return (getattr(orig, 'pgcode', None) or getattr(orig, 'sqlstate', None)) == '23P01'
+
+
+class Show(db.Model):
+   __tablename__='Show'
+   
+   id = db.Column(db.Integer,primary_key=True)
+   venue_id = db.Column(db.Integer,db.ForeignKey(Venue.id),nullable=False)#tablename.id
+   artist_id = db.Column(db.Integer,db.ForeignKey(Artist.id),nullable=False)#tablename.id
+   start_time= db.Column(db.DateTime)
+   end_time = db.Column(db.DateTime, default=_default_end_time)
+   updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                          onupdate=datetime.utcnow, server_default=func.now())
+
+   __table_args__ = (
+       # show_venue / show_artist filter by the owner and split on start_time;
+       # the included column lets the joins be answered from the index alone
+       db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time',
+                postgresql_include=['artist_id']),
+       db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time',
+                postgresql_include=['venue_id']),
+       # keyset order of /shows
+       db.Index('ix_show_start_time_id', 'start_time', 'id'),
+       _bookings('ex_show_venue_booking', 'venue_id'),
+       _bookings('ex_show_artist_booking', 'artist_id'),
+   )
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+
+
+class ShowSubmission(db.Model):
+  """Outbox of show submissions waiting for the queued writer (showqueue.py)."""
+  __tablename__ = 'ShowSubmission'
+
+  id = db.Column(db.Integer, primary_key=True)
+  venue_id = db.Column(db.Integer, nullable=False)
+  artist_id = db.Column(db.Integer, nullable=False)
+  start_time = db.Column(db.DateTime, nullable=False)
+  end_time = db.Column(db.DateTime, nullable=False)
+  # pending, created, conflict or invalid
+  status = db.Column(db.String(16), nullable=False, default='pending', server_default='pending')
+  show_id = db.Column(db.Integer, db.ForeignKey('Show.id', ondelete='SET NULL'))
+  message = db.Column(db.String(255))
+  created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, server_default=func.now())
+  processed_at = db.Column(db.DateTime)
+
+  __table_args__ = (
+    # the writer claims the oldest pending submissions
+    db.Index('ix_show_submission_status_id', 'status', 'id'),
+  )
+
+# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+
+#----------------------------------------------------------------------------#
+# Genres.
+#----------------------------------------------------------------------------#
+
+def get_genres(names):
+  """Return the Genre rows for ``names``, creating the missing ones."""
+  names = sorted({name.strip() for name in names if name and name.strip()})
+  if not names:
+    return []
+  genres = Genre.query.filter(Genre.name.in_(names)).all()
+  known = {genre.name for genre in genres}
+  for name in names:
+    if name not in known:
+      genre = Genre(name=name)
+      db.session.add(genre)
+      genres.append(genre)
+  return genres
+
+
+def set_genres(obj, names):
+  """Replace the genres of a Venue or Artist with ``names``."""
+  obj.genres = get_genres(names)
+  # the association rows alone do not touch the owner row, but its
+  # updated_at feeds the ETag of the pages showing the genres
+  obj.updated_at = datetime.utcnow()
+
+
+def genre_filter(model, name):
+  """Criterion selecting the rows of ``model`` tagged with genre ``name``."""
+  table, column = (venue_genres, venue_genres.c.venue_id) if model is Venue \
+    else (artist_genres, artist_genres.c.artist_id)
+  return model.id.in_(
+    select(column).join(Genre, Genre.id == table.c.genre_id).where(Genre.name == name))
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+# Venue and Artist carry upcoming/past show counters so list and search pages
+# never have to aggregate Show. Inserts and deletes adjust them in the same
+# flush; refresh_show_counts() recomputes them for shows that have since
+# crossed into the past (run it periodically with `flask refresh-show-counts`).
+
+def _counter(start_time, now=None):
+  if start_time is None:
+    return None
+  return 'upcoming_shows_count' if start_time > (now or datetime.now()) else 'past_shows_count'
+
+
+def _adjust_counters(connection, show, delta):
+  counter = _counter(show.start_time)
+  if counter is None:
+    return
+  for model, key in ((Venue, show.venue_id), (Artist, show.artist_id)):
+    column = getattr(model, counter)
+    connection.execute(
+      model.__table__.update().where(model.id == key).values({column: column + delta}))
+
+
+@event.listens_for(Show, 'after_insert')
+def _show_inserted(mapper, connection, show):
+  _adjust_counters(connection, show, 1)
+
+
+@event.listens_for(Show, 'after_delete')
+def _show_deleted(mapper, connection, show):
+  _adjust_counters(connection, show, -1)
+
+
+@event.listens_for(Show, 'after_update')
+def _show_updated(mapper, connection, show):
+  state = inspect(show)
+  venue_ids, artist_ids = {show.venue_id}, {show.artist_id}
+  changed = False
+  for attr, ids in (('venue_id', venue_ids), ('artist_id', artist_ids), ('start_time', None)):
+    history = state.attrs[attr].history
+    if history.has_changes():
+      changed = True
+      if ids is not None:
+        ids.update(history.deleted)
+  if changed:
+    refresh_show_counts(connection, venue_ids=venue_ids, artist_ids=artist_ids)
+
+
+def refresh_show_counts(connection=None, venue_ids=None, artist_ids=None, since=None):
+  """Recompute the show counters.
+
+  With ``since``, only venues and artists with a show starting between
+  ``since`` and now are refreshed; otherwise the given ids, or every row.
+  """
+  if connection is None:
+    connection = db.session.connection()
+  now = datetime.now()
+  if since is not None:
+    crossed = select(Show.venue_id, Show.artist_id) \
+      .where(Show.start_time > since, Show.start_time <= now)
+    rows = connection.execute(crossed).all()
+    venue_ids = {row.venue_id for row in rows}
+    artist_ids = {row.artist_id for row in rows}
+
+  for model, fk, ids in ((Venue, Show.venue_id, venue_ids), (Artist, Show.artist_id, artist_ids)):
+    if ids is not None and not ids:
+      continue
+    upcoming = select(func.count(Show.id)) \
+      .where(fk == model.id, Show.start_time > now).scalar_subquery()
+    past = select(func.count(Show.id)) \
+      .where(fk == model.id, Show.start_time <= now).scalar_subquery()
+    update = model.__table__.update().values(upcoming_shows_count=upcoming, past_shows_count=past)
+    if ids is not None:
+      update = update.where(model.id.in_(ids))
+    connection.execute(update)
@@ -0,0 +1,386 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+from sqlalchemy import Boolean, DateTime, func, or_, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from sqlalchemy.sql.functions import FunctionElement
+from models import db, Venue, Artist, Show, genre_filter
+
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+# Query builders shared by the controllers and `flask explain-queries`, so the
+# plans we inspect are the statements we actually run.
+
+def venue_detail_query(venue_id):
+  # the venue, its shows and every referenced artist in a single statement,
+  # plus one for its genres
+  return Venue.query.options(
+      joinedload(Venue.Shows).joinedload(Show.Artist),
+      selectinload(Venue.genres)
+  ).filter_by(id=venue_id)
+
+
+def artist_detail_query(artist_id):
+  # the artist, its shows and every referenced venue in a single statement,
+  # plus one for its genres
+  return Artist.query.options(
+      joinedload(Artist.shows).joinedload(Show.Venue),
+      selectinload(Artist.genres)
+  ).filter_by(id=artist_id)
+
+
+def venue_detail(venue_id):
+  """Return the show_venue data of a venue and the start time of its next show.
+
+  Returns ``(None, None)`` for an unknown venue.
+  """
+  venue = venue_detail_query(venue_id).first()
+  if not venue:
+    return None, None
+
+  now = datetime.now()
+  next_show_time = None
+  pastShows = []
+  upcomingShows = []
+
+  # like shows_query, shows without a start time are left out
+  for show in sorted((s for s in venue.Shows if s.start_time is not None), key=lambda s: s.start_time):
+      entry = {
+          "artist_id": show.Artist.id,
+          "artist_name": show.Artist.name,
+          "artist_image_link": show.Artist.image_link,
+          "start_time": show.start_time
+      }
+      if show.start_time > now:
+        next_show_time = next_show_time or show.start_time
+        upcomingShows.append(entry)
+      else:
+        pastShows.append(entry)
+
+  data = {
+      "id": venue.id,
+      "name": venue.name,
+      "city": venue.city,
+      "state": venue.state,
+      "phone": venue.phone,
+      "image_link": venue.image_link,
+      "website": venue.website,
+      "genres": [genre.name for genre in venue.genres],
+      "facebook_link": venue.facebook_link,
+      "seeking_description": venue.seeking_description,
+      "past_shows": pastShows,
+      "past_shows_count": len(pastShows),
+      "upcoming_shows": upcomingShows,
+      "upcoming_shows_count": len(upcomingShows)
+  }
+  return data, next_show_time
+
+
+def artist_detail(artist_id):
+  """Return the show_artist data of an artist and the start time of its next show.
+
+  Returns ``(None, None)`` for an unknown artist.
+  """
+  artist = artist_detail_query(artist_id).first()
+  if not artist:
+    return None, None
+
+  now = datetime.now()
+  next_show_time = None
+  past_shows = []
+  upcoming_shows = []
+
+  # like shows_query, shows without a start time are left out
+  for show in sorted((s for s in artist.shows if s.start_time is not None), key=lambda s: s.start_time):
+    entry = {
+      "venue_id": show.venue_id,
+      "venue_name": show.Venue.name,
+      "venue_image_link": show.Venue.image_link,
+      "start_time": show.start_time
+    }
+    if show.start_time > now:
+      next_show_time = next_show_time or show.start_time
+      upcoming_shows.append(entry)
+    else:
+      past_shows.append(entry)
+
+  data = {
+    "id": artist.id,
+    "name": artist.name,
+    "genres": [genre.name for genre in artist.genres],
+    "city": artist.city,
+    "state": artist.state,
+    "phone": artist.phone,
+    "website": artist.website,
+    "facebook_link": artist.facebook_link,
+    "seeking_venue": artist.seeking_venue,
+    "seeking_description": artist.seeking_description,
+    "image_link": artist.image_link,
+    "past_shows": past_shows,
+    "upcoming_shows": upcoming_shows,
+    "past_shows_count": len(past_shows),
+    "upcoming_shows_count": len(upcoming_shows),
+  }
+  return data, next_show_time
+
+
+def artist_list_query(genre=None):
+  # the columns an artist listing needs, in name order
+  query = db.session.query(Artist.id, Artist.name)
+  if genre:
+    query = query.filter(genre_filter(Artist, genre))
+  return query.order_by(Artist.name, Artist.id)
+
+
+def artist_page_query(after_name=None, after_id=None, letter=None, genre=None):
+  # the columns pages/artists.html renders, in keyset order on (lower(name), id),
+  # which ix_artist_lower_name_id serves without a sort; a letter starts the
+  # listing at the first name from that letter on. Artists without a name sort
+  # first, as '': compared as NULL they could never be paged past
+  sort_name = func.coalesce(func.lower(Artist.name), '')
+  query = db.session.query(Artist.id, Artist.name, sort_name.label('sort_name'),
+                           Artist.city, Artist.state, Artist.phone, Artist.facebook_link)
+  if genre:
+    query = query.filter(genre_filter(Artist, genre))
+  if after_name is not None and after_id is not None:
+    query = query.filter(tuple_(sort_name, Artist.id) > tuple_(after_name, after_id))
+  elif letter:
+    query = query.filter(sort_name >= letter.lower())
+  return query.order_by(sort_name, Artist.id)
+
+
+SHOW_FILTERS = ('start', 'end', 'city', 'venue_id', 'artist_id', 'genre')
+
+
+def _date_arg(value, end=False):
+  # a plain date covers the whole day, so ?to=2024-05-31 includes that day
+  parsed = datetime.fromisoformat(value)
+  if end and len(value) == 10:
+    parsed += timedelta(days=1)
+  return parsed
+
+
+def show_filters(args):
+  """Read the /shows filters from request ``args``, as shows_query() kwargs.
+
+  ``from`` and ``to`` are ISO dates or datetimes (``to`` is exclusive, but a
+  plain date includes that day). Raises ValueError on a malformed value.
+  """
+  filters = {}
+  if args.get('from'):
+    filters['start'] = _date_arg(args['from'])
+  if args.get('to'):
+    filters['end'] = _date_arg(args['to'], end=True)
+  for name in ('venue_id', 'artist_id'):
+    if args.get(name):
+      filters[name] = int(args[name])
+  for name in ('city', 'genre'):
+    if args.get(name):
+      filters[name] = args[name]
+  return filters
+
+
+def _filter_shows(query, start=None, end=None, city=None, venue_id=None, artist_id=None, genre=None):
+  # start/end are a range on start_time, served by ix_show_start_time_id, or
+  # by the (venue_id, start_time) / (artist_id, start_time) indexes together
+  # with an id
+  if start is not None:
+    query = query.filter(Show.start_time >= start)
+  if end is not None:
+    query = query.filter(Show.start_time < end)
+  if venue_id is not None:
+    query = query.filter(Show.venue_id == venue_id)
+  if artist_id is not None:
+    query = query.filter(Show.artist_id == artist_id)
+  if city:
+    query = query.filter(Venue.city == city)
+  if genre:
+    query = query.filter(genre_filter(Artist, genre))
+  return query
+
+
+def shows_query(after_time=None, after_id=None, **filters):
+  # only the columns pages/shows.html renders, in keyset order on (start_time, id);
+  # a genre selects the shows of artists playing it
+  query = db.session.query(
+      Show.id,
+      Show.venue_id,
+      Venue.name.label('venue_name'),
+      Show.artist_id,
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link'),
+      Show.start_time
+  ).join(Venue, Show.venue_id == Venue.id) \
+   .join(Artist, Show.artist_id == Artist.id) \
+   .filter(Show.start_time.isnot(None))
+
+  query = _filter_shows(query, **filters)
+  if after_time is not None and after_id is not None:
+    query = query.filter(tuple_(Show.start_time, Show.id) > tuple_(after_time, after_id))
+  return query.order_by(Show.start_time, Show.id)
+
+
+CALENDAR_UNITS = ('day', 'week', 'month')
+
+
+def show_calendar_query(unit='day', **filters):
+  # number of shows per day/week/month, counted by the database
+  period = date_trunc(unit, Show.start_time).label('period')
+  query = db.session.query(period, func.count(Show.id).label('shows')) \
+    .filter(Show.start_time.isnot(None))
+  if filters.get('city') or filters.get('genre'):
+    query = query.join(Venue, Show.venue_id == Venue.id).join(Artist, Show.artist_id == Artist.id)
+  query = _filter_shows(query, **filters)
+  return query.group_by(period).order_by(period)
+
+
+def venue_directory_query(state=None, genre=None):
+  # one ordered query for the whole /venues directory (or a single state)
+  query = db.session.query(
+      Venue.id,
+      Venue.name,
+      Venue.city,
+      Venue.state,
+      Venue.upcoming_shows_count.label('num_upcoming_shows')
+  )
+  if state:
+    query = query.filter(Venue.state == state)
+  if genre:
+    query = query.filter(genre_filter(Venue, genre))
+  return query.order_by(Venue.state, Venue.city, Venue.name, Venue.id)
+
+#----------------------------------------------------------------------------#
+# Bookings.
+#----------------------------------------------------------------------------#
+
+def booking_conflicts(venue_id, artist_id, start_time, end_time, exclude_id=None):
+  """Shows of the venue or the artist overlapping [start_time, end_time)."""
+  query = db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.end_time) \
+    .filter(or_(Show.venue_id == venue_id, Show.artist_id == artist_id),
+            overlaps(Show.start_time, Show.end_time, start_time, end_time))
+  if exclude_id is not None:
+    query = query.filter(Show.id != exclude_id)
+  return query.order_by(Show.start_time)
+
+
+def venue_bookings_query(venue_id, start, end):
+  """Shows of a venue overlapping [start, end), in start order."""
+  return db.session.query(Show.start_time, Show.end_time) \
+    .filter(Show.venue_id == venue_id, overlaps(Show.start_time, Show.end_time, start, end)) \
+    .order_by(Show.start_time)
+
+
+def venue_availability(venue_id, start, end, min_duration=None):
+  """Free ``(start, end)`` intervals of a venue between ``start`` and ``end``.
+
+  One query for the shows overlapping the range (the ex_show_venue_booking
+  GiST index on Postgres); the gaps between them are the free slots, those
+  shorter than ``min_duration`` left out.
+  """
+  bookings = venue_bookings_query(venue_id, start, end)
+  slots = []
+  free_from = start
+  for booked_from, booked_until in bookings:
+    if booked_from > free_from:
+      slots.append((free_from, booked_from))
+    free_from = max(free_from, booked_until)
+  if free_from < end:
+    slots.append((free_from, end))
+  if min_duration is not None:
+    slots = [slot for slot in slots if slot[1] - slot[0] >= min_duration]
+  return slots
+
+
+class overlaps(FunctionElement):
+  """Whether the interval [start_column, end_column) overlaps [start, end)."""
+
+  type = Boolean()
+  inherit_cache = True
+  name = 'overlaps'
+
+
+@compiles(overlaps, 'postgresql')
+def _pg_overlaps(element, compiler, **kw):
+  # the expression and the predicate of the exclusion constraints' partial
+  # GiST indexes: without the IS NOT NULLs the planner cannot use them
+  start_column, end_column, start, end = [compiler.process(clause, **kw) for clause in element.clauses]
+  return '(%s IS NOT NULL AND %s IS NOT NULL AND tsrange(%s, %s) && tsrange(%s, %s))' % (
+    start_column, end_column, start_column, end_column, start, end)
+
+
+@compiles(overlaps)
+def _default_overlaps(element, compiler, **kw):
+  start_column, end_column, start, end = element.clauses
+  return '(%s < %s AND %s > %s)' % tuple(
+    compiler.process(clause, **kw) for clause in (start_column, end, end_column, start))
+
+#----------------------------------------------------------------------------#
+# date_trunc.
+#----------------------------------------------------------------------------#
+
+class date_trunc(FunctionElement):
+  """``date_trunc(unit, value)``, emulated with datetime() outside Postgres."""
+
+  type = DateTime()
+  inherit_cache = False
+  name = 'date_trunc'
+
+  def __init__(self, unit, value):
+    if unit not in CALENDAR_UNITS:
+      raise ValueError('unit must be one of %s' % ', '.join(CALENDAR_UNITS))
+    self.unit = unit
+    super(date_trunc, self).__init__(value)
+
+
+@compiles(date_trunc, 'postgresql')
+def _pg_date_trunc(element, compiler, **kw):
+  return "date_trunc('%s', %s)" % (element.unit, compiler.process(element.clauses, **kw))
+
+
+SQLITE_TRUNC = {
+  'day': "'start of day'",
+  # weeks start on Monday, as in Postgres
+  'week': "'start of day', '-6 days', 'weekday 1'",
+  'month': "'start of month'",
+}
+
+
+@compiles(date_trunc, 'sqlite')
+def _sqlite_date_trunc(element, compiler, **kw):
+  return 'datetime(%s, %s)' % (compiler.process(element.clauses, **kw), SQLITE_TRUNC[element.unit])
+
+#----------------------------------------------------------------------------#
+# Explain.
+#----------------------------------------------------------------------------#
+
+class explain(Executable, ClauseElement):
+  """EXPLAIN (ANALYZE) of a statement, executed with its own bind parameters."""
+
+  inherit_cache = False
+
+  def __init__(self, statement, analyze=False):
+    self.statement = statement
+    self.analyze = analyze
+
+
+@compiles(explain, 'postgresql')
+def _pg_explain(element, compiler, **kw):
+  prefix = 'EXPLAIN (ANALYZE, BUFFERS) ' if element.analyze else 'EXPLAIN '
+  return prefix + compiler.process(element.statement, **kw)
+
+
+@compiles(explain)
+def _default_explain(element, compiler, **kw):
+  return 'EXPLAIN QUERY PLAN ' + compiler.process(element.statement, **kw)
+
+
+def explain_query(query, analyze=True):
+  """Return the plan of an ORM query as a list of text lines."""
+  rows = db.session.execute(explain(query.statement, analyze=analyze)).fetchall()
+  return [' | '.join(str(value) for value in row) for row in rows]
@@ -0,0 +1,116 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import random
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+
+#----------------------------------------------------------------------------#
+# Read replicas.
+#----------------------------------------------------------------------------#
+
+# Replicas are the SQLALCHEMY_BINDS whose key starts with 'replica'. GET and
+# HEAD requests, and views marked @read_only whatever their method (the
+# search forms POST), read from one of them; everything else, flushes, CLI
+# commands and requests from a client that wrote within
+# READ_YOUR_WRITES_SECONDS (e.g. the redirect after edit_venue_submission)
+# use the primary. A replica that is unreachable or lags by more than
+# REPLICA_MAX_LAG_SECONDS is skipped until its next check; with no usable
+# replica, reads fall back to the primary. The pin is a cookie of its own
+# rather than a session key, so other responses do not read the session (and
+# get Vary: Cookie).
+
+REPLICA_PREFIX = 'replica'
+PRIMARY_UNTIL_COOKIE = 'fyyur_primary_until'
+
+_lag_lock = threading.Lock()
+_lag_checked = {}
+
+
+def _lag_seconds(engine):
+  with engine.connect() as connection:
+    if engine.dialect.name != 'postgresql':
+      return 0.0
+    lag = connection.execute(text(
+      'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+      'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+    )).scalar()
+    return float(lag or 0.0)
+
+
+def _healthy(key, engine):
+  config = current_app.config
+  now = time.monotonic()
+  with _lag_lock:
+    checked = _lag_checked.get(key)
+    if checked and now - checked[0] < config.get('REPLICA_LAG_CHECK_INTERVAL', 5):
+      return checked[1]
+  try:
+    healthy = _lag_seconds(engine) <= config.get('REPLICA_MAX_LAG_SECONDS', 10)
+  except Exception:
+    current_app.logger.warning('replica %s is unreachable', key, exc_info=True)
+    healthy = False
+  with _lag_lock:
+    _lag_checked[key] = (now, healthy)
+  return healthy
+
+
+def read_only(view):
+  """Mark a view that only reads, so it may use a replica whatever its method."""
+  view.read_only = True
+  return view
+
+
+def _wants_replica():
+  if not has_request_context():
+    return False
+  if request.method not in ('GET', 'HEAD') and \
+      not getattr(current_app.view_functions.get(request.endpoint), 'read_only', False):
+    return False
+  try:
+    primary_until = float(request.cookies.get(PRIMARY_UNTIL_COOKIE, 0))
+  except ValueError:
+    primary_until = 0
+  return primary_until < time.time()
+
+
+class RoutingSession(Session):
+  """Session that sends the reads of read-only requests to a replica."""
+
+  def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+    if bind is None and not self._flushing and _wants_replica():
+      replica = self._replica()
+      if replica is not None:
+        return replica
+    return super(RoutingSession, self).get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+  def _replica(self):
+    # one replica per request, so a page reads a consistent snapshot
+    if 'db_replica' not in g:
+      engines = self._db.engines
+      keys = [key for key in engines if key and key.startswith(REPLICA_PREFIX)]
+      random.shuffle(keys)
+      g.db_replica = next((engines[key] for key in keys if _healthy(key, engines[key])), None)
+    return g.db_replica
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _committed(db_session):
+  if has_request_context():
+    g.db_wrote = True
+
+
+def init_routing(app):
+  """Pin clients to the primary for a while after they write."""
+
+  @app.after_request
+  def _read_your_writes(response):
+    if g.pop('db_wrote', False):
+      seconds = app.config.get('READ_YOUR_WRITES_SECONDS', 10)
+      response.set_cookie(PRIMARY_UNTIL_COOKIE, '%.3f' % (time.time() + seconds), max_age=seconds,
+                          httponly=True, samesite='Lax')
+    return response
@@ -0,0 +1,123 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from flask import current_app
+from sqlalchemy import func
+from cache import LRUCache
+from models import db, Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+# On Postgres, name/city/state are matched through a single expression that is
+# covered by a pg_trgm GiST index (see migration 3f8c6e1a9b47). The ILIKE
+# below and the ranking by trigram distance (<->) both use it, so ORDER BY ...
+# LIMIT reads the best matches straight from the index instead of sorting
+# every match; a one-letter term costs no more than a precise one. For the
+# same reason the total is not counted: a search reports at most ``limit``
+# results, and ``more`` when there are others. Other databases (SQLite in
+# tests) run the same ILIKE unindexed and order by name.
+
+def _document(model):
+  # must stay identical to the indexed expression in the migration
+  return func.coalesce(model.name, '') + ' ' + \
+         func.coalesce(model.city, '') + ' ' + \
+         func.coalesce(model.state, '')
+
+
+def _escape(term):
+  return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _search(model, term, limit=None):
+  term = (term or '').strip()
+  if limit is None:
+    limit = current_app.config['SEARCH_RESULTS_LIMIT']
+
+  query = db.session.query(
+      model.id,
+      model.name,
+      model.upcoming_shows_count.label('num_upcoming_shows')
+  ).filter(_document(model).ilike('%' + _escape(term) + '%', escape='\\'))
+
+  if term and db.session.get_bind().dialect.name == 'postgresql':
+    query = query.order_by(_document(model).self_group().op('<->')(term), model.id)
+  else:
+    query = query.order_by(model.name, model.id)
+
+  # one row more tells whether there are others
+  rows = query.limit(limit + 1).all()
+  more = len(rows) > limit
+  rows = rows[:limit]
+  return {
+      "count": len(rows),
+      "more": more,
+      "data": [{
+          "id": row.id,
+          "name": row.name,
+          "num_upcoming_shows": row.num_upcoming_shows
+      } for row in rows]
+  }
+
+
+def search_venues(term, limit=None):
+  return _search(Venue, term, limit)
+
+
+def search_artists(term, limit=None):
+  return _search(Artist, term, limit)
+
+#----------------------------------------------------------------------------#
+# Autocomplete.
+#----------------------------------------------------------------------------#
+
+# The artist and venue pickers of the new show form ask for the names
+# starting with what has been typed so far. On Postgres lower(name) LIKE
+# 'prefix%' is a range scan of the text_pattern_ops btree indexes of
+# migration 9a6f3c2e7d15, and at most AUTOCOMPLETE_LIMIT names are returned.
+# Every keystroke of every user asks again for the same few short prefixes,
+# so answers are kept in a per-process LRU for AUTOCOMPLETE_CACHE_TIMEOUT
+# seconds; a renamed or new venue or artist shows up once it has expired.
+
+def _prefix_cache():
+  extensions = current_app.extensions
+  if 'autocomplete_cache' not in extensions:
+    extensions['autocomplete_cache'] = LRUCache(current_app.config['AUTOCOMPLETE_CACHE_THRESHOLD'])
+  return extensions['autocomplete_cache']
+
+
+def _autocomplete(model, prefix, limit=None):
+  prefix = (prefix or '').strip().lower()
+  if not prefix:
+    return []
+  if limit is None:
+    limit = current_app.config['AUTOCOMPLETE_LIMIT']
+
+  key = (model.__tablename__, prefix, limit)
+  cache = _prefix_cache()
+  data = cache.get(key)
+  if data is not None:
+    return data
+
+  rows = db.session.query(model.id, model.name, model.city, model.state) \
+    .filter(func.lower(model.name).like(_escape(prefix) + '%', escape='\\')) \
+    .order_by(func.lower(model.name), model.id) \
+    .limit(limit).all()
+  data = [{
+      "id": row.id,
+      "name": row.name,
+      "city": row.city,
+      "state": row.state
+  } for row in rows]
+  cache.set(key, data, current_app.config['AUTOCOMPLETE_CACHE_TIMEOUT'])
+  return data
+
+
+def autocomplete_venues(prefix, limit=None):
+  return _autocomplete(Venue, prefix, limit)
+
+
+def autocomplete_artists(prefix, limit=None):
+  return _autocomplete(Artist, prefix, limit)
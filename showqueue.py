@@ -0,0 +1,235 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import os
+import threading
+import time
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, or_, select, text
+import queries
+from models import db, Venue, Artist, Show, ShowSubmission, refresh_show_counts
+
+#----------------------------------------------------------------------------#
+# Queued show creation.
+#----------------------------------------------------------------------------#
+
+# With SHOW_WRITE_MODE = 'queued', create_show_submission validates the form,
+# records the submission in the ShowSubmission outbox and answers at once
+# with a pending status. A writer thread per worker process wakes up after
+# SHOW_QUEUE_FLUSH_INTERVAL seconds, so a burst of submissions is collected,
+# and turns up to SHOW_QUEUE_BATCH_SIZE of them into shows in one
+# transaction:
+#
+# - a submission overlapping a show of its venue or artist (or an earlier
+#   submission of the same batch) is marked 'conflict' instead of
+#   double-booking them;
+# - the venue and artist counters are refreshed once per batch rather than
+#   updated row by row, so a popular venue's row is locked once per batch.
+#
+# The outbox is the queue: pending rows left by a stopped worker are picked
+# up by the next writer, and on Postgres FOR UPDATE SKIP LOCKED plus an
+# advisory lock per venue and artist keep the writers of different processes
+# apart (the exclusion constraints of Show reject anything that slips by).
+# `flask shows process-queue` drains it from the command line.
+
+SUBMISSION_PENDING = 'pending'
+SUBMISSION_CREATED = 'created'
+SUBMISSION_CONFLICT = 'conflict'
+SUBMISSION_INVALID = 'invalid'
+
+show_queue_cli = AppGroup('shows', help='Queued show creation.')
+
+
+def queued(app=None):
+  """Whether show creation goes through the outbox."""
+  return (app or current_app).config.get('SHOW_WRITE_MODE') == 'queued'
+
+
+def enqueue_show(venue_id, artist_id, start_time, end_time):
+  """Record a validated submission and wake the writer; returns the submission."""
+  submission = ShowSubmission(venue_id=venue_id, artist_id=artist_id,
+                              start_time=start_time, end_time=end_time)
+  db.session.add(submission)
+  db.session.commit()
+  current_app.extensions['show_writer'].notify()
+  return submission
+
+
+def _claim(connection, limit):
+  query = select(ShowSubmission.__table__) \
+    .where(ShowSubmission.status == SUBMISSION_PENDING) \
+    .order_by(ShowSubmission.id).limit(limit)
+  if connection.dialect.name == 'postgresql':
+    query = query.with_for_update(skip_locked=True)
+  return connection.execute(query).all()
+
+
+def _booked(connection, submissions):
+  # intervals already booked by the venues and artists of the batch, in one query
+  venue_ids = sorted({row.venue_id for row in submissions})
+  artist_ids = sorted({row.artist_id for row in submissions})
+  if connection.dialect.name == 'postgresql':
+    # serialize writers booking the same venue or artist, in a fixed order
+    for kind, ids in ((1, venue_ids), (2, artist_ids)):
+      for key in ids:
+        connection.execute(text('SELECT pg_advisory_xact_lock(:kind, :key)'), {"kind": kind, "key": key})
+  earliest = min(row.start_time for row in submissions)
+  latest = max(row.end_time for row in submissions)
+  rows = connection.execute(
+    select(Show.venue_id, Show.artist_id, Show.start_time, Show.end_time)
+    .where(or_(Show.venue_id.in_(venue_ids), Show.artist_id.in_(artist_ids)),
+           queries.overlaps(Show.start_time, Show.end_time, earliest, latest))
+  ).all()
+  booked = {}
+  for row in rows:
+    _book(booked, row)
+  return booked
+
+
+def _book(booked, row):
+  for key in (('venue', row.venue_id), ('artist', row.artist_id)):
+    booked.setdefault(key, []).append((row.start_time, row.end_time))
+
+
+def _conflicts(booked, row):
+  return any(start < row.end_time and end > row.start_time
+             for key in (('venue', row.venue_id), ('artist', row.artist_id))
+             for start, end in booked.get(key, ()))
+
+
+def _existing(connection, model, ids):
+  return set(connection.execute(select(model.id).where(model.id.in_(ids))).scalars())
+
+
+def process_batch(limit=100):
+  """Turn up to ``limit`` pending submissions into shows; returns how many were handled."""
+  connection = db.session.connection()
+  submissions = _claim(connection, limit)
+  if not submissions:
+    db.session.rollback()
+    return 0
+
+  booked = _booked(connection, submissions)
+  venues = _existing(connection, Venue, {row.venue_id for row in submissions})
+  artists = _existing(connection, Artist, {row.artist_id for row in submissions})
+
+  now = datetime.utcnow()
+  accepted, results = [], []
+  for row in submissions:
+    result = {"submission_id": row.id, "status": SUBMISSION_CREATED, "message": None,
+              "show_id": None, "processed_at": now}
+    if row.venue_id not in venues or row.artist_id not in artists:
+      result.update(status=SUBMISSION_INVALID, message='The venue or artist no longer exists.')
+    elif _conflicts(booked, row):
+      result.update(status=SUBMISSION_CONFLICT, message='The venue or the artist already has a show at that time.')
+    else:
+      _book(booked, row)
+      accepted.append((row, result))
+    results.append(result)
+
+  # Core inserts skip the per-row counter listeners of models.py; the
+  # counters are refreshed once for the whole batch below
+  if accepted:
+    show_ids = connection.execute(
+      Show.__table__.insert().returning(Show.__table__.c.id, sort_by_parameter_order=True),
+      [{"venue_id": row.venue_id, "artist_id": row.artist_id, "start_time": row.start_time,
+        "end_time": row.end_time, "updated_at": now} for row, result in accepted]).scalars().all()
+    for (row, result), show_id in zip(accepted, show_ids):
+      result['show_id'] = show_id
+    refresh_show_counts(connection, venue_ids={row.venue_id for row, result in accepted},
+                        artist_ids={row.artist_id for row, result in accepted})
+
+  table = ShowSubmission.__table__
+  connection.execute(
+    table.update().where(table.c.id == bindparam('submission_id')).values(
+      status=bindparam('status'), message=bindparam('message'),
+      show_id=bindparam('show_id'), processed_at=bindparam('processed_at')),
+    results)
+  db.session.commit()
+  return len(submissions)
+
+
+def drain(batch_size=100):
+  """Process pending submissions until none are left; returns how many were handled."""
+  handled = 0
+  while True:
+    count = process_batch(batch_size)
+    if not count:
+      return handled
+    handled += count
+
+#----------------------------------------------------------------------------#
+# Writer thread.
+#----------------------------------------------------------------------------#
+
+class ShowWriter(object):
+  """Background thread of a worker process draining the outbox in batches."""
+
+  def __init__(self, app):
+    self.app = app
+    self._wake = threading.Event()
+    self._lock = threading.Lock()
+    self._thread = None
+    self._pid = None
+
+  def notify(self):
+    self._ensure_started()
+    self._wake.set()
+
+  def _ensure_started(self):
+    # threads do not survive a fork, so each worker process starts its own
+    with self._lock:
+      if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='show-writer', daemon=True)
+        self._thread.start()
+
+  def _run(self):
+    config = self.app.config
+    while True:
+      self._wake.wait(config.get('SHOW_QUEUE_POLL_INTERVAL', 5))
+      self._wake.clear()
+      # let a burst of submissions accumulate into one batch
+      time.sleep(config.get('SHOW_QUEUE_FLUSH_INTERVAL', 0.5))
+      with self.app.app_context():
+        try:
+          drain(config.get('SHOW_QUEUE_BATCH_SIZE', 100))
+        except Exception:
+          db.session.rollback()
+          self.app.logger.exception('show writer failed, the submissions stay pending')
+        finally:
+          db.session.remove()
+
+
+def init_show_queue(app):
+  app.extensions['show_writer'] = ShowWriter(app)
+
+
+def submission_status(submission_id):
+  """Return the status of a submission as a dict, or None."""
+  submission = db.session.get(ShowSubmission, submission_id)
+  if submission is None:
+    return None
+  return {
+    "id": submission.id,
+    "status": submission.status,
+    "show_id": submission.show_id,
+    "message": submission.message,
+    "venue_id": submission.venue_id,
+    "artist_id": submission.artist_id,
+    "start_time": submission.start_time,
+    "end_time": submission.end_time,
+  }
+
+#  Commands
+#  ----------------------------------------------------------------
+
+@show_queue_cli.command('process-queue')
+@click.option('--batch-size', default=100, show_default=True)
+def process_queue_command(batch_size):
+  """Create the shows of every pending submission."""
+  click.echo('processed %d submissions' % drain(batch_size))
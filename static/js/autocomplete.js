@@ -0,0 +1,51 @@
+// Name pickers of the new show form: an input with data-autocomplete="<url>"
+// asks the url for the names starting with what has been typed, offers them in
+// its datalist and copies the id of the chosen one into data-target.
+(function () {
+  var DELAY = 150;
+
+  function label(item) {
+    var place = [item.city, item.state].filter(Boolean).join(', ');
+    return item.name + (place ? ' (' + place + ')' : '') + ' #' + item.id;
+  }
+
+  function attach(input) {
+    var list = document.getElementById(input.getAttribute('list'));
+    var target = document.getElementById(input.getAttribute('data-target'));
+    var url = input.getAttribute('data-autocomplete');
+    var ids = {};
+    var timer = null;
+    var latest = null;
+
+    input.addEventListener('input', function () {
+      var value = input.value;
+      if (ids.hasOwnProperty(value)) {
+        target.value = ids[value];
+        return;
+      }
+      clearTimeout(timer);
+      if (!value.trim()) {
+        return;
+      }
+      timer = setTimeout(function () {
+        latest = value;
+        fetch(url + '?q=' + encodeURIComponent(value), {headers: {'Accept': 'application/json'}})
+          .then(function (response) { return response.json(); })
+          .then(function (items) {
+            if (latest !== value) {
+              return;
+            }
+            list.innerHTML = '';
+            items.forEach(function (item) {
+              var option = document.createElement('option');
+              option.value = label(item);
+              ids[option.value] = item.id;
+              list.appendChild(option);
+            });
+          });
+      }, DELAY);
+    });
+  }
+
+  Array.prototype.forEach.call(document.querySelectorAll('[data-autocomplete]'), attach);
+})();
@@ -0,0 +1,106 @@
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+# an in-memory SQLite database, so the tests run without Postgres; the page
+# cache would answer repeated requests without any SQL
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['CACHE_TYPE'] = 'null'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db, Venue, Artist, Show, set_genres
+import routing
+
+
+@pytest.fixture
+def app():
+  flask_app = create_app({'TESTING': True, 'SECRET_KEY': 'test', 'WTF_CSRF_ENABLED': False})
+  with flask_app.app_context():
+    db.create_all()
+  yield flask_app
+  with flask_app.app_context():
+    db.session.remove()
+    db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+  return app.test_client()
+
+
+@pytest.fixture
+def make_data(app):
+  """Create ``venues`` venues and ``artists`` artists sharing ``shows`` shows."""
+
+  def make(venues=1, artists=1, shows=1):
+    with app.app_context():
+      venue_rows = [Venue(name='Venue %d' % i, city='San Francisco', state='CA') for i in range(venues)]
+      artist_rows = [Artist(name='Artist %d' % i, city='San Francisco', state='CA') for i in range(artists)]
+      for row in venue_rows + artist_rows:
+        set_genres(row, ['Jazz', 'Blues'])
+      db.session.add_all(venue_rows + artist_rows)
+      db.session.flush()
+      now = datetime.now()
+      # half in the past and half upcoming, across every venue and artist
+      db.session.add_all([
+        Show(venue_id=venue_rows[i % venues].id, artist_id=artist_rows[i % artists].id,
+             start_time=now + timedelta(days=i - shows // 2))
+        for i in range(shows)
+      ])
+      db.session.commit()
+      return venue_rows[0].id, artist_rows[0].id
+
+  return make
+
+
+@pytest.fixture
+def count_queries(app):
+  """Context manager counting the SQL statements run inside it."""
+
+  @contextmanager
+  def count():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+      statements.append(statement)
+
+    with app.app_context():
+      engines = list(db.engines.values())
+    for engine in engines:
+      event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+      yield statements
+    finally:
+      for engine in engines:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+  return count
+
+
+@pytest.fixture
+def replica_app():
+  """An app reading from a 'replica_0' database besides its primary."""
+  routing._lag_checked.clear()
+  flask_app = create_app({'TESTING': True, 'SECRET_KEY': 'test', 'WTF_CSRF_ENABLED': False,
+                          'SQLALCHEMY_BINDS': {'replica_0': 'sqlite://'}})
+  with flask_app.app_context():
+    db.create_all()
+    db.metadata.create_all(db.engines['replica_0'])
+    # a venue of each name, so a page shows which database it read
+    db.session.add(Venue(name='Primary Hall', city='Austin', state='TX'))
+    db.session.commit()
+    with db.engines['replica_0'].begin() as connection:
+      connection.execute(Venue.__table__.insert(), {'name': 'Replica Hall', 'city': 'Austin', 'state': 'TX'})
+  yield flask_app
+  with flask_app.app_context():
+    db.session.remove()
+    db.drop_all()
+  # Flask-SQLAlchemy registers a metadata per bind key for good, and
+  # create_all() of the other tests' apps would look for its engine
+  db.metadatas.pop('replica_0', None)
+  routing._lag_checked.clear()
@@ -0,0 +1,51 @@
+import re
+
+import queries
+from models import db, Artist
+
+NAMES = ['alpha', 'Bravo', 'Charlie', 'charlie', 'Delta', 'echo']
+
+
+def _page(client, url):
+  html = client.get(url).get_data(as_text=True)
+  names = [name for name in re.findall(r'<h5>(.*?)</h5>', html) if name in NAMES]
+  next_url = re.search(r'class="next"><a href="([^"]+)"', html)
+  return names, next_url and next_url.group(1).replace('&amp;', '&')
+
+
+def test_artists_are_paginated_by_name(app, client):
+  app.config['ARTISTS_PER_PAGE'] = 2
+  with app.app_context():
+    db.session.add_all([Artist(name=name) for name in reversed(NAMES)])
+    db.session.commit()
+
+  seen, url = [], '/artists'
+  while url:
+    names, url = _page(client, url)
+    assert len(names) <= 2
+    seen += names
+  assert [name.lower() for name in seen] == sorted(name.lower() for name in NAMES)
+
+  # jump to a letter, whatever the case of the names
+  names, next_url = _page(client, '/artists?letter=c')
+  assert sorted(names) == ['Charlie', 'charlie']
+
+
+def test_artist_listing_loads_only_the_listed_columns(app):
+  with app.app_context():
+    assert 'seeking_description' not in str(queries.artist_page_query().statement)
+
+
+def test_artists_without_a_name_are_paginated(app, client):
+  app.config['ARTISTS_PER_PAGE'] = 2
+  with app.app_context():
+    db.session.add_all([Artist(name=None) for _ in range(3)] + [Artist(name=name) for name in NAMES[:3]])
+    db.session.commit()
+
+  pages, seen, url = 0, [], '/artists'
+  while url:
+    pages += 1
+    assert pages <= 3
+    names, url = _page(client, url)
+    seen += names
+  assert seen == NAMES[:3]
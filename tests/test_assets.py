@@ -0,0 +1,66 @@
+import gzip
+
+import assets
+
+
+def test_minify_css_keeps_strings_and_licenses():
+  source = '/*! license */\n.a ,\n.b > .c {\n  content: "x  ;  /* y */";\n  color: red; /* note */\n}\n'
+  assert assets.minify_css(source) == '/*! license */ .a,.b>.c{content:"x  ;  /* y */";color:red}'
+
+
+def test_build_fingerprints_bundles_and_referenced_files(tmp_path):
+  static, output = tmp_path / 'static', tmp_path / 'dist'
+  (static / 'css').mkdir(parents=True)
+  (static / 'fonts').mkdir()
+  (static / 'fonts' / 'icons.woff').write_bytes(b'font')
+  (static / 'css' / 'a.css').write_text('.icon { src: url("../fonts/icons.woff?v=1"); }\n')
+  (static / 'css' / 'b.css').write_text('.missing { background: url(../img/none.png); }\n')
+
+  manifest = assets.build(str(static), str(output), {'site.css': ['css/a.css', 'css/b.css']})
+  assert manifest['site.css'].startswith('site.') and manifest['site.css'].endswith('.css')
+  assert manifest['fonts/icons.woff'].startswith('fonts/icons.')
+  css = (output / manifest['site.css']).read_text()
+  assert 'url("%s?v=1")' % manifest['fonts/icons.woff'] in css
+  assert 'url("/static/img/none.png")' in css
+  assert gzip.decompress((output / (manifest['site.css'] + '.gz')).read_bytes()).decode() == css
+  assert (output / 'manifest.json').exists()
+  # the same content gets the same name
+  assert assets.build(str(static), str(output), {'site.css': ['css/a.css', 'css/b.css']}) == manifest
+
+
+def test_built_bundles_are_served_compressed_and_immutable(app, client, tmp_path):
+  app.config['ASSETS_FOLDER'] = str(tmp_path)
+  html = client.get('/').get_data(as_text=True)
+  # nothing built yet: the source files
+  assert '/static/css/main.css' in html
+
+  manifest = assets.build(app.static_folder, str(tmp_path))
+  app.extensions.pop('assets_manifest', None)
+  html = client.get('/').get_data(as_text=True)
+  assert '/assets/' + manifest['main.css'] in html
+  assert '/static/css/main.css' not in html
+
+  response = client.get('/assets/' + manifest['main.css'], headers={'Accept-Encoding': 'gzip'})
+  assert response.status_code == 200
+  assert response.content_encoding == 'gzip'
+  assert response.mimetype == 'text/css'
+  assert response.cache_control.immutable
+  assert response.cache_control.max_age == app.config['ASSETS_MAX_AGE']
+  assert 'Accept-Encoding' in response.vary
+  assert gzip.decompress(response.data) == (tmp_path / manifest['main.css']).read_bytes()
+
+  response = client.get('/assets/' + manifest['main.js'])
+  assert response.content_encoding is None
+  assert response.data == (tmp_path / manifest['main.js']).read_bytes()
+
+
+def test_page_etags_change_with_the_built_bundles(app, client, make_data, tmp_path):
+  app.config['ASSETS_FOLDER'] = str(tmp_path)
+  venue_id, _ = make_data()
+  before = client.get('/venues/%d' % venue_id).headers['ETag']
+
+  assets.build(app.static_folder, str(tmp_path))
+  app.extensions.pop('assets_manifest', None)
+  response = client.get('/venues/%d' % venue_id, headers={'If-None-Match': before})
+  assert response.status_code == 200
+  assert response.headers['ETag'] != before
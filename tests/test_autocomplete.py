@@ -0,0 +1,33 @@
+from models import db, Artist
+
+
+def test_autocomplete_matches_prefixes_and_is_bounded(app, client, make_data):
+  app.config['AUTOCOMPLETE_LIMIT'] = 3
+  make_data(venues=5, artists=1, shows=0)
+  with app.app_context():
+    db.session.add_all([Artist(name='100% Jazz'), Artist(name='Artistic License')])
+    db.session.commit()
+
+  names = [item['name'] for item in client.get('/api/v1/venues/autocomplete?q=VENUE').get_json()]
+  assert names == ['Venue 0', 'Venue 1', 'Venue 2']
+  names = [item['name'] for item in client.get('/api/v1/artists/autocomplete?q=artist').get_json()]
+  assert names == ['Artist 0', 'Artistic License']
+  # LIKE wildcards are matched literally
+  names = [item['name'] for item in client.get('/api/v1/artists/autocomplete?q=100%25').get_json()]
+  assert names == ['100% Jazz']
+  assert client.get('/api/v1/artists/autocomplete?q=').get_json() == []
+
+
+def test_hot_prefixes_are_answered_from_memory(app, client, make_data, count_queries):
+  make_data(venues=2, artists=1, shows=0)
+  response = client.get('/api/v1/venues/autocomplete?q=ven')
+  assert response.cache_control.max_age == app.config['AUTOCOMPLETE_CACHE_TIMEOUT']
+  with count_queries() as statements:
+    assert client.get('/api/v1/venues/autocomplete?q=Ven').get_json() == response.get_json()
+  assert statements == []
+
+
+def test_new_show_form_has_the_pickers(client):
+  html = client.get('/shows/create').data
+  assert b'data-autocomplete="/api/v1/artists/autocomplete"' in html
+  assert b'data-autocomplete="/api/v1/venues/autocomplete"' in html
@@ -0,0 +1,17 @@
+from unittest.mock import patch
+
+import pytest
+
+import benchmark
+
+
+def test_run_restores_the_app_when_a_route_fails(app, make_data):
+  make_data()
+  app.config['WTF_CSRF_ENABLED'] = True
+  page_cache, log_level = app.extensions['page_cache'], app.logger.level
+  with patch('benchmark._percentile', side_effect=RuntimeError('boom')):
+    with pytest.raises(RuntimeError):
+      benchmark.run(app, repeat=1)
+  assert app.config['WTF_CSRF_ENABLED'] is True
+  assert app.extensions['page_cache'] is page_cache
+  assert app.logger.level == log_level
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import queries
+from models import db, Show
+
+
+def _book(venue_id, artist_id, start, hours=2):
+  db.session.add(Show(venue_id=venue_id, artist_id=artist_id, start_time=start,
+                      end_time=start + timedelta(hours=hours)))
+  db.session.commit()
+
+
+def test_create_show_rejects_overlapping_bookings(app, client, make_data):
+  venue_id, artist_id = make_data(venues=1, artists=1, shows=0)
+  form = {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': '2040-01-01 20:00'}
+  assert b'successfully listed' in client.post('/shows/create', data=form).data
+  form['start_time'] = '2040-01-01 21:00'
+  assert b'already has a show' in client.post('/shows/create', data=form).data
+  # back to back is fine
+  form['start_time'] = '2040-01-01 22:00'
+  assert b'successfully listed' in client.post('/shows/create', data=form).data
+  with app.app_context():
+    assert Show.query.count() == 2
+
+
+def test_venue_availability(app, client, make_data):
+  venue_id, artist_id = make_data(venues=1, artists=1, shows=0)
+  with app.app_context():
+    _book(venue_id, artist_id, datetime(2040, 1, 1, 18))
+    _book(venue_id, artist_id, datetime(2040, 1, 1, 21), hours=3)
+    assert queries.venue_availability(venue_id, datetime(2040, 1, 1, 12), datetime(2040, 1, 2)) == [
+      (datetime(2040, 1, 1, 12), datetime(2040, 1, 1, 18)),
+      (datetime(2040, 1, 1, 20), datetime(2040, 1, 1, 21)),
+    ]
+
+  response = client.get('/api/v1/venues/%d/availability?from=2040-01-01T12:00&to=2040-01-01&duration=120' % venue_id)
+  assert response.json == {
+    'venue_id': venue_id, 'from': '2040-01-01T12:00:00', 'to': '2040-01-02T00:00:00',
+    'slots': [{'start': '2040-01-01T12:00:00', 'end': '2040-01-01T18:00:00'}],
+  }
+  assert client.get('/api/v1/venues/%d/availability' % (venue_id + 1)).status_code == 404
+
+
+def test_venue_availability_revalidates_when_the_default_window_moves(client, make_data):
+  venue_id, _ = make_data(shows=0)
+  url = '/api/v1/venues/%d/availability' % venue_id
+  etag = client.get(url).headers['ETag']
+  assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+  later = datetime.now() + timedelta(hours=2)
+
+  class _Later(datetime):
+    @classmethod
+    def now(cls, tz=None):
+      return later
+
+  with patch('api.datetime', _Later):
+    response = client.get(url, headers={'If-None-Match': etag})
+  assert response.status_code == 200
+  assert response.json['from'] == later.replace(minute=0, second=0, microsecond=0).isoformat()
+  assert client.get(url + '?duration=60', headers={'If-None-Match': etag}).status_code == 200
+
@@ -0,0 +1,73 @@
+import io
+from datetime import datetime
+
+import pytest
+
+import bulk
+from models import db, Venue, Artist, Show, Genre
+
+
+def _export(model, fmt):
+  file = io.StringIO()
+  count = bulk.export_rows(model, file, fmt)
+  return count, file.getvalue()
+
+
+def _import(model, text, fmt, **kwargs):
+  imported = bulk.import_rows(model, bulk._read(io.StringIO(text), fmt), **kwargs)
+  db.session.commit()
+  return imported
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson'])
+def test_export_then_import_roundtrip(app, make_data, fmt):
+  make_data(venues=2, artists=2, shows=4)
+  with app.app_context():
+    exported = {model: _export(model, fmt) for model in (Venue, Artist, Show)}
+    assert [count for count, text in exported.values()] == [2, 2, 4]
+    db.drop_all()
+    db.create_all()
+
+    for model in (Venue, Artist, Show):
+      assert _import(model, exported[model][1], fmt) == (exported[model][0], 0)
+    for model in (Venue, Artist, Show):
+      assert _export(model, fmt) == exported[model]
+    venue = db.session.get(Venue, 1)
+    assert [genre.name for genre in venue.genres] == ['Blues', 'Jazz']
+    assert venue.upcoming_shows_count + venue.past_shows_count == 2
+
+
+def test_import_links_genres_creating_new_ones(app):
+  with app.app_context():
+    _import(Venue, 'name,city,state,genres\nThe Hall,Austin,TX,"Jazz,Rock"\n', 'csv')
+    _import(Artist, '{"name": "Band", "city": "Austin", "state": "TX", "genres": ["Rock"]}\n', 'ndjson')
+    assert sorted(db.session.scalars(db.select(Genre.name))) == ['Jazz', 'Rock']
+    assert [genre.name for genre in Venue.query.one().genres] == ['Jazz', 'Rock']
+    assert [genre.name for genre in Artist.query.one().genres] == ['Rock']
+
+
+def test_import_shows_with_an_unknown_venue_or_artist(app, make_data):
+  venue_id, artist_id = make_data(shows=0)
+  rows = 'venue_id,artist_id,start_time\n%d,%d,2040-01-01T20:00\n%d,%d,2040-01-02T20:00\n' % (
+    venue_id, artist_id, venue_id + 1, artist_id)
+  with app.app_context():
+    with pytest.raises(bulk.BulkError, match='unknown venue ids'):
+      _import(Show, rows, 'csv')
+    db.session.rollback()
+    assert _import(Show, rows, 'csv', skip_invalid=True) == (1, 1)
+    assert Show.query.one().end_time == datetime(2040, 1, 1, 22)
+
+
+def test_import_shows_overlapping_a_booking(app, make_data):
+  venue_id, artist_id = make_data(shows=0)
+  with app.app_context():
+    _import(Show, 'venue_id,artist_id,start_time\n%d,%d,2040-01-01T20:00\n' % (venue_id, artist_id), 'csv')
+    # overlaps the show above, then the first show of the file itself
+    rows = 'venue_id,artist_id,start_time\n%d,%d,2040-01-01T21:00\n%d,%d,2040-01-02T20:00\n%d,%d,2040-01-02T21:00\n' % (
+      venue_id, artist_id, venue_id, artist_id, venue_id, artist_id)
+    with pytest.raises(bulk.BulkError, match='overlaps another booking'):
+      _import(Show, rows, 'csv')
+    db.session.rollback()
+    assert _import(Show, rows, 'csv', skip_invalid=True) == (1, 2)
+    assert [show.start_time for show in Show.query.order_by(Show.start_time)] == [
+      datetime(2040, 1, 1, 20), datetime(2040, 1, 2, 20)]
@@ -0,0 +1,36 @@
+import pytest
+
+import routing
+from models import db, Venue
+
+
+@pytest.mark.parametrize('url', ['/venues', '/venues/{venue_id}', '/artists', '/artists/{artist_id}',
+                                 '/shows', '/api/v1/venues/{venue_id}'])
+def test_anonymous_pages_are_shared_cacheable(client, make_data, url):
+  venue_id, artist_id = make_data()
+  response = client.get(url.format(venue_id=venue_id, artist_id=artist_id))
+  response.get_data()
+  assert response.status_code == 200
+  assert response.cache_control.public
+  assert 'Cookie' not in response.vary
+
+
+def test_a_write_pins_reads_to_the_primary_with_its_own_cookie(client, make_data):
+  venue_id, artist_id = make_data(shows=0)
+  form = {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': '2040-01-01 20:00'}
+  response = client.post('/shows/create', data=form)
+  assert routing.PRIMARY_UNTIL_COOKIE in response.headers.get('Set-Cookie', '')
+  assert client.get_cookie(routing.PRIMARY_UNTIL_COOKIE) is not None
+
+
+def test_if_modified_since_alone_never_answers_a_304(app, client, make_data):
+  make_data(venues=2, shows=0)
+  response = client.get('/venues')
+  assert b'Venue 1' in response.get_data()
+  assert response.last_modified is None
+  with app.app_context():
+    db.session.delete(db.session.query(Venue).filter_by(name='Venue 1').one())
+    db.session.commit()
+  response = client.get('/venues', headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+  assert response.status_code == 200
+  assert b'Venue 1' not in response.get_data()
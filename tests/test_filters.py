@@ -0,0 +1,20 @@
+from datetime import datetime
+
+import babel.dates
+
+from app import format_datetime
+
+START = datetime(2040, 1, 2, 20, 30)
+
+
+def test_datetime_filter_formats():
+  assert format_datetime(START, 'full') == 'Monday January, 2, 2040 at 8:30PM'
+  assert format_datetime(START) == 'Mon 01, 02, 2040 8:30PM'
+  assert format_datetime('2040-01-02 20:30', 'full') == 'Monday January, 2, 2040 at 8:30PM'
+  assert format_datetime(START, 'yyyy-MM-dd HH:mm') == '2040-01-02 20:30'
+
+
+def test_datetime_filter_falls_back_to_babel_named_formats():
+  for format in ('short', 'long'):
+    assert format_datetime(START, format) == babel.dates.format_datetime(START, format, locale='en')
+  assert '2040' in format_datetime(START, 'long')
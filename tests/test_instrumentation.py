@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+import dbpool
+from models import db
+
+
+def test_metrics_need_the_token(app, client):
+  assert client.get('/metrics').status_code == 404
+
+  app.config['METRICS_TOKEN'] = 'secret'
+  assert client.get('/metrics').status_code == 401
+  assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+  response = client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+  assert response.status_code == 200
+  assert b'fyyur_requests_total' in response.data
+
+
+def test_pool_metrics_are_kept_per_engine(replica_app):
+  replica_app.config['METRICS_TOKEN'] = 'secret'
+  client = replica_app.test_client()
+  headers = {'Authorization': 'Bearer secret'}
+  assert client.get('/_status/pool').status_code == 401
+
+  before = client.get('/_status/pool', headers=headers).json
+  assert sorted(before) == ['primary', 'replica_0']
+  client.get('/venues').get_data()
+  after = client.get('/_status/pool', headers=headers).json
+  # the page read from the replica only
+  assert after['replica_0']['checkouts'] > before['replica_0']['checkouts']
+  assert after['primary']['checkouts'] == before['primary']['checkouts']
+
+  text = client.get('/metrics', headers=headers).get_data(as_text=True)
+  assert 'fyyur_db_pool_checkouts_total{engine="primary"}' in text
+  assert 'fyyur_db_pool_checkouts_total{engine="replica_0"}' in text
+
+
+def test_timed_pools_count_apart_and_across_a_dispose(tmp_path):
+  engines = [create_engine('sqlite:///%s' % (tmp_path / name), poolclass=dbpool.TimedQueuePool)
+             for name in ('a.db', 'b.db')]
+  for engine in engines:
+    dbpool.instrument(engine)
+  with engines[0].connect() as connection:
+    connection.execute(text('SELECT 1'))
+  engines[0].dispose()
+  with engines[0].connect() as connection:
+    connection.execute(text('SELECT 1'))
+  assert dbpool.status(engines[0])['checkouts'] == 2
+  assert dbpool.status(engines[0])['connects'] == 2
+  assert dbpool.status(engines[1])['checkouts'] == 0
+
+
+def test_failed_statements_do_not_leak_timers(app):
+  with app.app_context(), db.engine.connect() as conn:
+    with pytest.raises(exc.OperationalError):
+      conn.execute(text('SELECT * FROM no_such_table'))
+    assert conn.info['query_start'] == []
@@ -0,0 +1,16 @@
+import cache
+from models import db, Venue
+
+
+def test_an_edit_made_elsewhere_never_serves_the_cached_page(app, client, make_data):
+  # another worker's edit does not reach this worker's in-process cache
+  app.extensions['page_cache'] = cache.LRUCache()
+  venue_id, artist_id = make_data(shows=0)
+  assert b'Venue 0' in client.get('/venues/%d' % venue_id).data
+
+  with app.app_context():
+    db.session.get(Venue, venue_id).name = 'New Name'
+    db.session.commit()
+  response = client.get('/venues/%d' % venue_id)
+  assert b'New Name' in response.data
+  assert b'Venue 0' not in response.data
@@ -0,0 +1,113 @@
+import pytest
+
+from models import db, Show
+
+# Upper bounds on the SQL statements of each route. They must not grow with
+# the amount of data: a route that looks up a row per venue, artist or show
+# (e.g. Artist.query.get() inside a loop over shows) fails the "many" runs.
+
+SMALL = dict(venues=1, artists=1, shows=1)
+LARGE = dict(venues=20, artists=30, shows=1000)
+
+VENUE_FORM = {
+  'name': 'The Venue', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+  'phone': '512-555-0100', 'genres': ['Jazz', 'Blues'], 'facebook_link': 'https://www.facebook.com/venue',
+  'image_link': 'https://images.example.com/v.jpg', 'website': 'https://venue.example.com',
+}
+ARTIST_FORM = {
+  'name': 'The Artist', 'city': 'Austin', 'state': 'TX', 'phone': '512-555-0101',
+  'genres': ['Jazz'], 'facebook_link': 'https://www.facebook.com/artist',
+  'image_link': 'https://images.example.com/a.jpg', 'website': 'https://artist.example.com',
+}
+SHOW_FORM = {'venue_id': '{venue_id}', 'artist_id': '{artist_id}', 'start_time': '2040-01-01 20:00'}
+
+
+def _get(client, count_queries, method, url, data=None):
+  with count_queries() as statements:
+    response = client.open(url, method=method, data=data)
+    response.get_data()
+  response.close()
+  # the edit handlers redirect to the page they edited
+  assert response.status_code in (200, 302), url
+  return len(statements)
+
+
+@pytest.mark.parametrize('method, url, data, bound', [
+  ('GET', '/venues', None, 3),
+  ('GET', '/venues?state=CA', None, 3),
+  ('GET', '/venues?genre=Jazz', None, 3),
+  ('GET', '/venues/{venue_id}', None, 3),
+  ('GET', '/artists', None, 2),
+  ('GET', '/artists/{artist_id}', None, 3),
+  ('GET', '/shows', None, 2),
+  ('GET', '/shows?genre=Jazz&from=2000-01-01', None, 2),
+  ('POST', '/venues/search', {'search_term': 'venue'}, 1),
+  ('POST', '/artists/search', {'search_term': 'artist'}, 1),
+  ('GET', '/api/v1/venues', None, 2),
+  ('GET', '/api/v1/venues/{venue_id}', None, 3),
+  ('GET', '/api/v1/artists', None, 2),
+  ('GET', '/api/v1/artists/{artist_id}', None, 3),
+  ('GET', '/api/v1/shows', None, 2),
+  ('GET', '/api/v1/shows/calendar?unit=week', None, 2),
+  ('GET', '/api/v1/venues/autocomplete?q=ven', None, 1),
+  ('GET', '/api/v1/artists/autocomplete?q=art', None, 1),
+  ('GET', '/api/v1/venues/{venue_id}/availability?from=2040-01-01&to=2040-01-08', None, 3),
+  ('GET', '/', None, 0),
+  ('GET', '/venues/{venue_id}/edit', None, 1),
+  ('GET', '/artists/{artist_id}/edit', None, 1),
+  # the writes fire the show counter events and the booking conflict check
+  ('POST', '/venues/create', VENUE_FORM, 3),
+  ('POST', '/artists/create', ARTIST_FORM, 3),
+  ('POST', '/shows/create', SHOW_FORM, 4),
+  ('POST', '/venues/{venue_id}/edit', VENUE_FORM, 5),
+  # not implemented yet, it only redirects
+  ('POST', '/artists/{artist_id}/edit', ARTIST_FORM, 0),
+])
+def test_queries_are_bounded(app, make_data, count_queries, method, url, data, bound):
+  counts = []
+  for volume in (SMALL, LARGE):
+    client = app.test_client()
+    # or the autocomplete prefixes of the first run are answered from memory
+    app.extensions.pop('autocomplete_cache', None)
+    venue_id, artist_id = make_data(**volume)
+    form = data and dict(
+      (name, value.format(venue_id=venue_id, artist_id=artist_id) if isinstance(value, str) else value)
+      for name, value in data.items())
+    counts.append(_get(client, count_queries, method,
+                       url.format(venue_id=venue_id, artist_id=artist_id), form))
+  assert counts[0] == counts[1], 'statements grow with the data: %s' % counts
+  assert counts[1] <= bound
+
+
+def test_show_venue_is_constant_in_its_shows(app, make_data, count_queries):
+  counts = []
+  for shows in (1, 1000):
+    venue_id, artist_id = make_data(venues=1, artists=10, shows=shows)
+    counts.append(_get(app.test_client(), count_queries, 'GET', '/venues/%d' % venue_id))
+  assert counts[0] == counts[1]
+
+
+def test_show_artist_is_constant_in_its_shows(app, make_data, count_queries):
+  counts = []
+  for shows in (1, 1000):
+    venue_id, artist_id = make_data(venues=10, artists=1, shows=shows)
+    counts.append(_get(app.test_client(), count_queries, 'GET', '/artists/%d' % artist_id))
+  assert counts[0] == counts[1]
+
+
+def test_not_modified_runs_only_the_validator(client, make_data, count_queries):
+  venue_id, artist_id = make_data(**LARGE)
+  etag = client.get('/venues/%d' % venue_id).headers['ETag']
+  with count_queries() as statements:
+    response = client.get('/venues/%d' % venue_id, headers={'If-None-Match': etag})
+  assert response.status_code == 304
+  assert len(statements) == 1
+
+
+def test_detail_pages_skip_shows_without_a_start_time(app, client, make_data):
+  venue_id, artist_id = make_data(shows=2)
+  with app.app_context():
+    db.session.add(Show(venue_id=venue_id, artist_id=artist_id, start_time=None, end_time=None))
+    db.session.commit()
+  assert client.get('/venues/%d' % venue_id).status_code == 200
+  assert client.get('/artists/%d' % artist_id).status_code == 200
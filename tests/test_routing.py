@@ -0,0 +1,35 @@
+import time
+from unittest.mock import patch
+
+import pytest
+
+import routing
+
+
+def _read_from(response):
+  html = response.get_data(as_text=True)
+  assert ('Primary Hall' in html) != ('Replica Hall' in html)
+  return 'replica' if 'Replica Hall' in html else 'primary'
+
+
+def test_reads_and_searches_use_the_replica(replica_app):
+  client = replica_app.test_client()
+  assert _read_from(client.get('/venues')) == 'replica'
+  assert _read_from(client.post('/venues/search', data={'search_term': 'hall'})) == 'replica'
+
+  client.set_cookie(routing.PRIMARY_UNTIL_COOKIE, '%.3f' % (time.time() + 60))
+  assert _read_from(client.get('/venues')) == 'primary'
+  assert _read_from(client.post('/venues/search', data={'search_term': 'hall'})) == 'primary'
+
+
+@pytest.mark.parametrize('lag', [60, OSError('connection refused')])
+def test_a_lagging_or_unreachable_replica_falls_back_to_the_primary(replica_app, lag):
+  with patch('routing._lag_seconds', side_effect=[lag]) as lag_seconds:
+    client = replica_app.test_client()
+    assert _read_from(client.get('/venues')) == 'primary'
+    # the result is kept until the next check
+    assert _read_from(client.get('/venues')) == 'primary'
+  assert lag_seconds.call_count == 1
+
+  routing._lag_checked.clear()
+  assert _read_from(replica_app.test_client().get('/venues')) == 'replica'
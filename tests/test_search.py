@@ -0,0 +1,12 @@
+import search
+
+
+def test_search_reports_at_most_the_limit(app, client, make_data):
+  make_data(venues=3, artists=1, shows=0)
+  app.config['SEARCH_RESULTS_LIMIT'] = 2
+  with app.app_context():
+    results = search.search_venues('venue')
+    assert (results['count'], results['more']) == (2, True)
+    results = search.search_venues('venue 1')
+    assert (results['count'], results['more']) == (1, False)
+  assert b': 2+</h3>' in client.post('/venues/search', data={'search_term': 'venue'}).data
@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import pytest
+
+import queries
+from models import db, Show
+
+# 2040-01-01 is a Sunday
+START_TIMES = [
+  datetime(2040, 1, 1, 20), datetime(2040, 1, 2, 0), datetime(2040, 1, 7, 23, 30),
+  datetime(2040, 1, 8, 12), datetime(2040, 2, 29, 21),
+]
+
+
+@pytest.fixture
+def shows(app, make_data):
+  venue_id, artist_id = make_data(shows=0)
+  with app.app_context():
+    db.session.add_all([Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time)
+                        for start_time in START_TIMES])
+    db.session.commit()
+  return venue_id, artist_id
+
+
+def test_show_filters_read_the_query_args():
+  assert queries.show_filters({'from': '2040-01-01', 'to': '2040-01-07', 'venue_id': '3', 'genre': 'Jazz'}) == {
+    'start': datetime(2040, 1, 1), 'end': datetime(2040, 1, 8), 'venue_id': 3, 'genre': 'Jazz'}
+  # a datetime is an exclusive end, a date includes its day
+  assert queries.show_filters({'to': '2040-01-07T12:00'}) == {'end': datetime(2040, 1, 7, 12)}
+  assert queries.show_filters({'from': '', 'city': ''}) == {}
+  for args in ({'from': '01/01/2040'}, {'to': 'soon'}, {'artist_id': 'x'}):
+    with pytest.raises(ValueError):
+      queries.show_filters(args)
+
+
+def test_shows_between_from_and_to(app, shows):
+  with app.app_context():
+    def start_times(args):
+      return [row.start_time for row in queries.shows_query(**queries.show_filters(args))]
+
+    assert start_times({'from': '2040-01-02', 'to': '2040-01-07'}) == START_TIMES[1:3]
+    assert start_times({'from': '2040-01-02', 'to': '2040-01-07T23:30'}) == START_TIMES[1:2]
+    assert start_times({'from': '2040-01-08T12:00'}) == START_TIMES[3:]
+    assert start_times({'to': '2040-01-01'}) == START_TIMES[:1]
+
+
+@pytest.mark.parametrize('unit, periods', [
+  ('day', [(datetime(2040, 1, 1), 1), (datetime(2040, 1, 2), 1), (datetime(2040, 1, 7), 1),
+           (datetime(2040, 1, 8), 1), (datetime(2040, 2, 29), 1)]),
+  # weeks start on Monday, a Sunday belongs to the week before
+  ('week', [(datetime(2039, 12, 26), 1), (datetime(2040, 1, 2), 3), (datetime(2040, 2, 27), 1)]),
+  ('month', [(datetime(2040, 1, 1), 4), (datetime(2040, 2, 1), 1)]),
+])
+def test_show_calendar_counts_per_period(app, shows, unit, periods):
+  with app.app_context():
+    assert [tuple(row) for row in queries.show_calendar_query(unit)] == periods
+
+
+def test_show_calendar_api_applies_the_filters(client, shows):
+  response = client.get('/api/v1/shows/calendar?unit=month&from=2040-01-02&to=2040-01-07')
+  assert response.json == [{'period': '2040-01-01T00:00:00', 'shows': 2}]
+  assert client.get('/api/v1/shows/calendar?unit=year').status_code == 400
+  assert client.get('/api/v1/shows/calendar?from=tomorrow').status_code == 400
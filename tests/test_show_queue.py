@@ -0,0 +1,39 @@
+from datetime import datetime
+
+import showqueue
+from models import db, Venue, Show, ShowSubmission, DEFAULT_SHOW_DURATION
+
+
+def _submit(venue_id, artist_id, start_time):
+  submission = ShowSubmission(venue_id=venue_id, artist_id=artist_id, start_time=start_time,
+                              end_time=start_time + DEFAULT_SHOW_DURATION)
+  db.session.add(submission)
+  db.session.commit()
+  return submission.id
+
+
+def test_batch_creates_shows_and_rejects_double_bookings(app, make_data, count_queries):
+  venue_id, artist_id = make_data(venues=1, artists=1, shows=0)
+  with app.app_context():
+    ids = [
+      _submit(venue_id, artist_id, datetime(2040, 1, 1, 20)),
+      # overlaps the first one, in the same batch
+      _submit(venue_id, artist_id, datetime(2040, 1, 1, 21)),
+      _submit(venue_id, artist_id, datetime(2040, 1, 2, 20)),
+      _submit(venue_id + 100, artist_id, datetime(2040, 1, 3, 20)),
+    ]
+    with count_queries() as statements:
+      assert showqueue.process_batch(100) == 4
+    statuses = [db.session.get(ShowSubmission, id).status for id in ids]
+    assert statuses == ['created', 'conflict', 'created', 'invalid']
+    assert Show.query.count() == 2
+    assert db.session.get(Venue, venue_id).upcoming_shows_count == 2
+    # claim, booked intervals, venue and artist ids, two counter refreshes and
+    # the status update, however large the batch (SQLite may split the
+    # INSERT ... RETURNING of the shows per row)
+    assert len([statement for statement in statements if not statement.startswith('INSERT')]) <= 7
+
+    # a later batch sees the shows created by the earlier one
+    conflicting = _submit(venue_id, artist_id, datetime(2040, 1, 2, 19))
+    assert showqueue.drain() == 1
+    assert db.session.get(ShowSubmission, conflicting).status == 'conflict'
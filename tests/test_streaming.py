@@ -0,0 +1,36 @@
+from unittest.mock import patch
+
+import pytest
+
+import instrumentation
+
+
+@pytest.mark.parametrize('url', ['/venues', '/artists', '/shows'])
+def test_list_pages_are_streamed(client, make_data, url):
+  make_data(venues=3, artists=3, shows=6)
+  response = client.get(url)
+  assert response.is_streamed
+  assert response.status_code == 200
+  assert b'</html>' in response.data
+
+
+def test_flashed_messages_are_shown_once_on_streamed_pages(client, make_data):
+  make_data()
+  with client.session_transaction() as session:
+    session['_flashes'] = [('message', 'Venue was successfully listed!')]
+  assert b'successfully listed' in client.get('/venues').data
+  assert b'successfully listed' not in client.get('/venues').data
+
+
+def test_streamed_pages_are_measured_after_the_body(app, client, make_data):
+  make_data(venues=3, artists=3, shows=6)
+  app.config['SQL_QUERY_WARNING_THRESHOLD'] = 1
+  before = instrumentation.metrics.snapshot()['sql_statements'].get('main.venues', 0)
+  with patch.object(app.logger, 'warning') as warning:
+    response = client.get('/venues')
+    response.get_data()
+    response.close()
+  # the validator, the states and the directory query, the latter run while streaming
+  assert instrumentation.metrics.snapshot()['sql_statements']['main.venues'] - before == 3
+  assert warning.called
+
@@ -0,0 +1,12 @@
+#----------------------------------------------------------------------------#
+# WSGI entry point.
+#----------------------------------------------------------------------------#
+
+# gunicorn -c gunicorn.conf.py, or any WSGI server pointed at wsgi:app.
+# With preload the app is built once in the master and shared by the forked
+# workers; gunicorn.conf.py drops the master's database connections after
+# the fork.
+
+from app import create_app
+
+app = create_app()